@@ -20,7 +20,7 @@
 # dnf session bus dBus service (Readonly)
 #
 
-from dnfdaemon.server import Logger
+from dnfdaemon.server import Logger, MainLoopSignal
 
 import argparse
 import dbus
@@ -55,8 +55,10 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
 
     def __init__(self):
         dnfdaemon.server.DnfDaemonBase.__init__(self)
-        bus_name = dbus.service.BusName(DAEMON_ORG, bus=dbus.SessionBus())
+        bus = dbus.SessionBus()
+        bus_name = dbus.service.BusName(DAEMON_ORG, bus=bus)
         dbus.service.Object.__init__(self, bus_name, '/')
+        self._setup_name_watch(bus)
 
 #=========================================================================
 # DBus Methods
@@ -76,17 +78,21 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='',
                          out_signature='b',
-                         sender_keyword='sender')
-    def Exit(self, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def Exit(self, sender=None, reply_handler=None, error_handler=None):
         '''
         Exit the daemon
         :param sender:
         '''
         if self._can_quit:
-            self.mainloop_quit()
-            return True
+            def reply():
+                reply_handler(True)
+                self.mainloop_quit()
+            # the base is closed, when the running work is done
+            self.run_in_worker(reply, error_handler, self._reset_base)
         else:
-            return False
+            reply_handler(False)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
@@ -100,6 +106,7 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         '''
         if not self._lock:
             self._lock = sender
+            self._watch_sender(sender)
             logger.info('LOCK: Locked by : %s' % sender)
             return True
         return False
@@ -122,53 +129,77 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='',
                          out_signature='b',
-                         sender_keyword='sender')
-    def ExpireCache(self, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def ExpireCache(self, sender=None, reply_handler=None, error_handler=None):
         '''
         Enabled a list of repositories, disabled all other repos
         :param repo_ids: list of repo ids to enable
         :param sender:
         '''
         self.working_start(sender)
-        rc = self.expire_cache()
-        return self.working_ended(rc)
+        self.run_in_worker(reply_handler, error_handler, self.expire_cache)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='',
+                         out_signature='s',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def RefreshCache(self, sender=None, reply_handler=None,
+                     error_handler=None):
+        '''
+        Refresh the metadata of the enabled repositories, if it has changed
+        the sack is only loaded again, if some metadata was updated
+        :param sender:
+        :return: dict with repo_id : 'updated', 'unchanged' or 'failed'
+                 in JSON format
+        '''
+        self.working_start(sender)
+        self.run_in_worker(reply_handler, error_handler, self.refresh_cache)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='s',
                          out_signature='as',
-                         sender_keyword='sender')
-    def GetRepositories(self, filter, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetRepositories(self, filter, sender=None, reply_handler=None,
+                        error_handler=None):
         '''
         Get the value a list of repo ids
         :param filter: filter to limit the listed repositories
         :param sender:
         '''
         self.working_start(sender)
-        repos = self.get_repositories(filter)
-        return self.working_ended(repos)
+        self.run_in_worker(reply_handler, error_handler, self.get_repositories,
+                           filter)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='as',
                          out_signature='',
-                         sender_keyword='sender')
-    def SetEnabledRepos(self, repo_ids, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def SetEnabledRepos(self, repo_ids, sender=None, reply_handler=None,
+                        error_handler=None):
         '''
         Enabled a list of repositories, disabled all other repos
         :param repo_ids: list of repo ids to enable
         :param sender:
         '''
         self.working_start(sender)
-        self.set_enabled_repos(repo_ids)
-        return self.working_ended()
+        self.run_in_worker(reply_handler, error_handler,
+                           self.set_enabled_repos, repo_ids)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='s',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GetConfig(self, setting, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetConfig(self, setting, sender=None, reply_handler=None,
+                  error_handler=None):
         '''
         Get the value of a yum config setting
         it will return a JSON string of the config
@@ -176,15 +207,17 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :param sender:
         '''
         self.working_start(sender)
-        value = self.get_config(setting)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.get_config,
+                           setting)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='s',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GetRepo(self, repo_id, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetRepo(self, repo_id, sender=None, reply_handler=None,
+                error_handler=None):
         '''
         Get information about a give repo_id
         the repo setting will be returned as dictionary in JSON format
@@ -192,30 +225,119 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :param sender:
         '''
         self.working_start(sender)
-        value = self.get_repo(repo_id)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.get_repo,
+                           repo_id)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='sas',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GetPackages(self, pkg_filter, fields, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetPackages(self, pkg_filter, fields, sender=None, reply_handler=None,
+                    error_handler=None):
         '''
         Get a list of package ids, based on a package pkg_filterer
         :param pkg_filter: pkg pkg_filter string ('installed','updates' etc)
         :param sender:
         '''
         self.working_start(sender)
-        value = self.get_packages(pkg_filter, fields)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.get_packages,
+                           pkg_filter, fields)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='sas',
+                         out_signature='a(sa{sv})',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetPackagesNative(self, pkg_filter, fields, sender=None,
+                          reply_handler=None, error_handler=None):
+        '''
+        Get a list of packages, based on a package pkg_filter
+        it will return an array of (pkg_id, {field: value}) with all
+        fields, a field with no value is an empty byte array (ay)
+        :param pkg_filter: pkg pkg_filter string ('installed','updates' etc)
+        :param fields: list of package attributes to get
+        :param sender:
+        '''
+        self.working_start(sender)
+        self.run_in_worker(reply_handler, error_handler,
+                           self.get_packages_native, pkg_filter, fields)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='sas',
+                         out_signature='s',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetPackagesChunked(self, pkg_filter, fields, sender=None,
+                           reply_handler=None, error_handler=None):
+        '''
+        Get a list of packages, based on a package pkg_filter, in chunks
+        it will return a handle at once, the packages are send in
+        PackageChunk signals with the handle, a null chunk ends the result
+        :param pkg_filter: pkg pkg_filter string ('installed','updates' etc)
+        :param fields: list of package attributes to get
+        :param sender:
+        '''
+        self.working_start(sender)
+        self.run_in_worker(reply_handler, error_handler,
+                           self.get_packages_chunked, pkg_filter, fields)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='sassii',
+                         out_signature='s',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetPackagesPaged(self, pkg_filter, fields, sort_key, offset, limit,
+                         sender=None, reply_handler=None, error_handler=None):
+        '''
+        Get a page of packages, based on a package pkg_filter
+        it will return a dict with cursor, total & packages in JSON format
+        the cursor can be used with GetPackagesPage to get the other pages
+        :param pkg_filter: pkg pkg_filter string ('installed','updates' etc)
+        :param fields: list of package attributes to get
+        :param sort_key: package attribute to sort by ('' = no sorting),
+                         see dnfdaemon.server.SORT_KEYS
+        :param offset: index of the first package in the page
+        :param limit: max. number of packages in the page
+        :param sender:
+        '''
+        self.working_start(sender)
+        self.run_in_worker(reply_handler, error_handler,
+                           self.get_packages_paged, pkg_filter, fields,
+                           sort_key, offset, limit, sender)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='sii',
+                         out_signature='s',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetPackagesPage(self, cursor, offset, limit, sender=None,
+                        reply_handler=None, error_handler=None):
+        '''
+        Get a page of packages from a cursor returned by GetPackagesPaged
+        it will return None in JSON format, if the cursor is expired
+        :param cursor: cursor from GetPackagesPaged
+        :param offset: index of the first package in the page
+        :param limit: max. number of packages in the page
+        :param sender:
+        '''
+        self.working_start(sender)
+        self.run_in_worker(reply_handler, error_handler,
+                           self.get_packages_page, cursor, offset, limit)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='sasb',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GetPackagesByName(self, name, attrs, newest_only, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetPackagesByName(self, name, attrs, newest_only, sender=None,
+                          reply_handler=None, error_handler=None):
         '''
         Get a list of packages from a name pattern
         :param name: name pattern
@@ -224,15 +346,40 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :param sender:
         '''
         self.working_start(sender)
-        values = self.get_packages_by_name_with_attr(name, attrs, newest_only)
-        return self.working_ended(values)
+        self.run_in_worker(reply_handler, error_handler,
+                           self.get_packages_by_name_with_attr, name, attrs,
+                           newest_only)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='sasb',
+                         out_signature='a(sa{sv})',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetPackagesByNameNative(self, name, attrs, newest_only, sender=None,
+                                reply_handler=None, error_handler=None):
+        '''
+        Get a list of packages from a name pattern
+        it will return an array of (pkg_id, {attr: value}) with all
+        attributes, an attribute with no value is an empty byte array (ay)
+        :param name: name pattern
+        :param newest_only: True = get newest packages only
+        :param attrs: list of package attributes to get
+        :param sender:
+        '''
+        self.working_start(sender)
+        self.run_in_worker(reply_handler, error_handler,
+                           self.get_packages_by_name_native, name, attrs,
+                           newest_only)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='ss',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GetAttribute(self, id, attr, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetAttribute(self, id, attr, sender=None, reply_handler=None,
+                     error_handler=None):
         '''
         Get an attribute from a yum package id
         it will return a python repr string of the attribute
@@ -242,29 +389,52 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :param sender:
         '''
         self.working_start(sender)
-        value = self.get_attribute(id, attr)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.get_attribute,
+                           id, attr)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='asas',
+                         out_signature='s',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetAttributes(self, ids, attrs, sender=None, reply_handler=None,
+                      error_handler=None):
+        '''
+        Get a list of attributes for a list of yum package ids
+        it will return a dict of id -> {attr: value} in JSON format
+        :param ids: list of yum package ids
+        :param attrs: list of attribute names (summary, size,
+                              description, changelog etc..)
+        :param sender:
+        '''
+        self.working_start(sender)
+        self.run_in_worker(reply_handler, error_handler, self.get_attributes,
+                           ids, attrs)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='',
                          out_signature='b',
-                         sender_keyword='sender')
-    def Unlock(self, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def Unlock(self, sender=None, reply_handler=None, error_handler=None):
         ''' release the lock'''
         if self.check_lock(sender):
             logger.info('UNLOCK: Lock Release by %s' % self._lock)
             self._lock = None
-            self._reset_base()
-            return True
+            # park the base for the next client (--base-cache)
+            self.run_in_worker(lambda: reply_handler(True), error_handler,
+                               self._reset_base, True)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='asasasbbb',
                          out_signature='s',
-                         sender_keyword='sender')
-    def Search(self, fields, keys, attrs, match_all, newest_only,
-               tags, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def Search(self, fields, keys, attrs, match_all, newest_only, tags,
+               sender=None, reply_handler=None, error_handler=None):
         '''
         Search for for packages, where given fields contain given key words
         :param fields: list of fields to search in
@@ -276,39 +446,109 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :param tags: seach pkgtags
         '''
         self.working_start(sender)
-        result = self.search_with_attr(
-            fields, keys, attrs, match_all, newest_only, tags)
-        return self.working_ended(result)
+        self.run_in_worker(reply_handler, error_handler, self.search_with_attr,
+                           fields, keys, attrs, match_all, newest_only, tags)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='asasasbbb',
+                         out_signature='a(sa{sv})',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def SearchNative(self, fields, keys, attrs, match_all, newest_only, tags,
+                     sender=None, reply_handler=None, error_handler=None):
+        '''
+        Search for packages, where given fields contain given key words
+        it will return an array of (pkg_id, {attr: value}) with all
+        attributes, an attribute with no value is an empty byte array (ay)
+        :param fields: list of fields to search in
+        :param keys: list of keywords to search for
+        :param attrs: list of extra attributes to get
+        :param match_all: match all flag, if True return only packages
+                          matching all keys
+        :param newest_only: return only the newest version of a package
+        :param tags: seach pkgtags
+        '''
+        self.working_start(sender)
+        self.run_in_worker(reply_handler, error_handler, self.search_native,
+                           fields, keys, attrs, match_all, newest_only, tags)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='asasasbbb',
+                         out_signature='s',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def SearchChunked(self, fields, keys, attrs, match_all, newest_only, tags,
+                      sender=None, reply_handler=None, error_handler=None):
+        '''
+        Search for packages, where given fields contain given key words
+        it will return a handle at once, the packages are send in
+        PackageChunk signals with the handle, a null chunk ends the result
+        :param fields: list of fields to search in
+        :param keys: list of keywords to search for
+        :param attrs: list of extra attributes to get
+        :param match_all: match all flag, if True return only packages
+                          matching all keys
+        :param newest_only: return only the newest version of a package
+        :param tags: seach pkgtags
+        '''
+        self.working_start(sender)
+        self.run_in_worker(reply_handler, error_handler, self.search_chunked,
+                           fields, keys, attrs, match_all, newest_only, tags)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GetGroups(self, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetGroups(self, sender=None, reply_handler=None, error_handler=None):
         '''
         Return a category/group tree
         '''
         self.working_start(sender)
-        value = self.get_groups()
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.get_groups)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='ssas',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GetGroupPackages(self, grp_id, grp_flt, fields, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetGroupPackages(self, grp_id, grp_flt, fields, sender=None,
+                         reply_handler=None, error_handler=None):
+        '''
+        Get packages in a group by grp_id and grp_flt
+        :param grp_id: The Group id
+        :param grp_flt: Group Filter (all or default)
+        :param fields: list of package attributes to include in list
+        :param sender:
+        '''
+        self.working_start(sender)
+        self.run_in_worker(reply_handler, error_handler, self.get_group_pkgs,
+                           grp_id, grp_flt, fields)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='ssas',
+                         out_signature='a(sa{sv})',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetGroupPackagesNative(self, grp_id, grp_flt, fields, sender=None,
+                               reply_handler=None, error_handler=None):
         '''
         Get packages in a group by grp_id and grp_flt
+        it will return an array of (pkg_id, {field: value}) with all
+        fields, a field with no value is an empty byte array (ay)
         :param grp_id: The Group id
         :param grp_flt: Group Filter (all or default)
         :param fields: list of package attributes to include in list
         :param sender:
         '''
         self.working_start(sender)
-        value = self.get_group_pkgs(grp_id, grp_flt, fields)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler,
+                           self.get_group_pkgs_native, grp_id, grp_flt, fields)
 
 #
 #  Template for new method
@@ -316,39 +556,58 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
 #    @dbus.service.method(DAEMON_INTERFACE,
 #                                          in_signature='',
 #                                          out_signature='',
-#                                          sender_keyword='sender')
-#    def NewMethod(self, sender=None ):
+#                                          sender_keyword='sender',
+#                                          async_callbacks=('reply_handler',
+#                                                           'error_handler'))
+#    def NewMethod(self, sender=None, reply_handler=None,
+#                  error_handler=None):
 #        '''
 #
 #        '''
 #        self.working_start(sender)
-#        value = True
-#        return self.working_ended(value)
+#        self.run_in_worker(reply_handler, error_handler, self.new_method)
 #
 #=========================================================================
 # DBus signals
 #=========================================================================
+    @MainLoopSignal
+    @dbus.service.signal(DAEMON_INTERFACE)
+    def PackageChunk(self, handle, chunk):
+        ''' A chunk of packages for GetPackagesChunked/SearchChunked '''
+        pass
+
+    @MainLoopSignal
+    @dbus.service.signal(DAEMON_INTERFACE)
+    def BaseReady(self, ok):
+        ''' Loading of the package sack started by --warmup ended '''
+        pass
+
 # Parallel Download Progress signals
+    @MainLoopSignal
     @dbus.service.signal(DAEMON_INTERFACE)
     def ErrorMessage(self, error_msg):
         ''' Send an error message '''
         pass
 
+    @MainLoopSignal
     @dbus.service.signal(DAEMON_INTERFACE)
     def DownloadStart(self, num_files, num_bytes):
         ''' Starting a new parallel download batch '''
         pass
 
+    @MainLoopSignal
     @dbus.service.signal(DAEMON_INTERFACE)
     def DownloadProgress(self, name, frac, total_frac, total_files):
         ''' Progress for a single instance in the batch '''
         pass
 
+    @MainLoopSignal
     @dbus.service.signal(DAEMON_INTERFACE)
     def DownloadEnd(self, name, status, msg):
         ''' Download of af single instace ended '''
         pass
 
+    @MainLoopSignal
     @dbus.service.signal(DAEMON_INTERFACE)
     def RepoMetaDataProgress(self, name, frac):
         ''' Repository Metadata Download progress '''
@@ -381,6 +640,17 @@ def main():
     parser.add_argument('-v', '--verbose', action='store_true')
     parser.add_argument('-d', '--debug', action='store_true')
     parser.add_argument('--notimeout', action='store_true')
+    parser.add_argument('--warmup', action='store_true',
+                        help='load the package sack at startup')
+    parser.add_argument('--base-cache', type=int, default=0, metavar='MB',
+                        help='memory for keeping loaded package sacks for '
+                             'other repo & config combinations')
+    parser.add_argument('--load-workers', type=int, default=0, metavar='N',
+                        help='load the repository metadata in N processes')
+    parser.add_argument('--progress-rate', type=int, default=0,
+                        metavar='HZ',
+                        help='max. progress signals per second for each '
+                             'package (0 = send all)')
     args = parser.parse_args()
     if args.verbose:
         if args.debug:
@@ -391,7 +661,14 @@ def main():
 
     # setup the DBus mainloop
     dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
+    dbus.mainloop.glib.threads_init()
     yd = DnfDaemon()
+    yd._setup_worker()
+    yd._setup_base_cache(args.base_cache)
+    yd._setup_load_workers(args.load_workers)
+    yd._setup_progress_rate(args.progress_rate)
+    if args.warmup:
+        yd.start_warmup()
     if not args.notimeout:
         yd._setup_watchdog()
     yd.mainloop_run()
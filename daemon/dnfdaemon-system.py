@@ -23,7 +23,7 @@
 import os
 os.environ['XDG_RUNTIME_DIR'] = '/root'
 
-from dnfdaemon.server import Logger
+from dnfdaemon.server import Logger, MainLoopSignal
 
 import argparse
 import dbus
@@ -60,8 +60,11 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
 
     def __init__(self):
         dnfdaemon.server.DnfDaemonBase.__init__(self)
-        bus_name = dbus.service.BusName(DAEMON_ORG, bus=dbus.SystemBus())
+        self._bus = dbus.SystemBus()
+        self._polkit = None  # PolicyKit1 Authority proxy
+        bus_name = dbus.service.BusName(DAEMON_ORG, bus=self._bus)
         dbus.service.Object.__init__(self, bus_name, '/')
+        self._setup_name_watch(self._bus)
         logger.debug('Starting %s: API Version : %d', DAEMON_ORG,
                                               dnfdaemon.server.API_VERSION)
 
@@ -83,19 +86,22 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='',
                          out_signature='b',
-                         sender_keyword='sender')
-    def Exit(self, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def Exit(self, sender=None, reply_handler=None, error_handler=None):
         """
         Exit the daemon
         :param sender:
         """
         self.check_permission_read(sender)
         if self._can_quit:
-            self._reset_base()
-            self.mainloop_quit()
-            return True
+            def reply():
+                reply_handler(True)
+                self.mainloop_quit()
+            # the base is closed, when the running work is done
+            self.run_in_worker(reply, error_handler, self._reset_base)
         else:
-            return False
+            reply_handler(False)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
@@ -110,6 +116,7 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         self.check_permission_read(sender)
         if not self._lock:
             self._lock = sender
+            self._watch_sender(sender)
             logger.info('LOCK: Locked by : %s' % sender)
             return True
         return False
@@ -133,38 +140,43 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='s',
                          out_signature='as',
-                         sender_keyword='sender')
-    def GetRepositories(self, filter, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetRepositories(self, filter, sender=None, reply_handler=None,
+                        error_handler=None):
         """
         Get the value a list of repo ids
         :param filter: filter to limit the listed repositories
         :param sender:
         """
         self.working_start(sender, write=False)
-        repos = self.get_repositories(filter)
-        return self.working_ended(repos)
+        self.run_in_worker(reply_handler, error_handler, self.get_repositories,
+                           filter)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='as',
                          out_signature='',
-                         sender_keyword='sender')
-    def SetEnabledRepos(self, repo_ids, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def SetEnabledRepos(self, repo_ids, sender=None, reply_handler=None,
+                        error_handler=None):
         """
         Enabled a list of repositories, disabled all other repos
         :param repo_ids: list of repo ids to enable
         :param sender:
         """
         self.working_start(sender, write=False)
-        self.set_enabled_repos(repo_ids)
-        return self.working_ended()
+        self.run_in_worker(reply_handler, error_handler,
+                           self.set_enabled_repos, repo_ids)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='',
                          out_signature='b',
-                         sender_keyword='sender')
-    def ExpireCache(self, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def ExpireCache(self, sender=None, reply_handler=None, error_handler=None):
         """
         Enabled a list of repositories, disabled all other repos
         :param repo_ids: list of repo ids to enable
@@ -172,15 +184,34 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :return: True if cache is populated without errors
         """
         self.working_start(sender, write=False)
-        rc = self.expire_cache()
-        return self.working_ended(rc)
+        self.run_in_worker(reply_handler, error_handler, self.expire_cache)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='',
+                         out_signature='s',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def RefreshCache(self, sender=None, reply_handler=None,
+                     error_handler=None):
+        """
+        Refresh the metadata of the enabled repositories, if it has changed
+        the sack is only loaded again, if some metadata was updated
+        :param sender:
+        :return: dict with repo_id : 'updated', 'unchanged' or 'failed'
+                 in JSON format
+        """
+        self.working_start(sender, write=False)
+        self.run_in_worker(reply_handler, error_handler, self.refresh_cache)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='s',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GetConfig(self, setting, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetConfig(self, setting, sender=None, reply_handler=None,
+                  error_handler=None):
         """
         Get the value of a yum config setting
         it will return a JSON string of the config
@@ -188,15 +219,17 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :param sender:
         """
         self.working_start(sender, write=False)
-        value = self.get_config(setting)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.get_config,
+                           setting)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='ss',
                          out_signature='b',
-                         sender_keyword='sender')
-    def SetConfig(self, setting, value, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def SetConfig(self, setting, value, sender=None, reply_handler=None,
+                  error_handler=None):
         """
         Set yum config setting for the running session
         :param setting: yum conf setting to set
@@ -204,15 +237,17 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :param sender:
         """
         self.working_start(sender, write=False)
-        rc = self.set_option(setting, value)
-        return self.working_ended(rc)
+        self.run_in_worker(reply_handler, error_handler, self.set_option,
+                           setting, value)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='s',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GetRepo(self, repo_id, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetRepo(self, repo_id, sender=None, reply_handler=None,
+                error_handler=None):
         """
         Get information about a give repo_id
         the repo setting will be returned as dictionary in JSON format
@@ -220,30 +255,118 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :param sender:
         """
         self.working_start(sender, write=False)
-        value = self.get_repo(repo_id)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.get_repo,
+                           repo_id)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='sas',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GetPackages(self, pkg_filter, fields, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetPackages(self, pkg_filter, fields, sender=None, reply_handler=None,
+                    error_handler=None):
         """
         Get a list of package ids, based on a package pkg_filterer
         :param pkg_filter: pkg pkg_filter string ('installed','updates' etc)
         :param sender:
         """
+        self.run_query(sender, reply_handler, error_handler, 'get_packages',
+                       pkg_filter, fields)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='sas',
+                         out_signature='a(sa{sv})',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetPackagesNative(self, pkg_filter, fields, sender=None,
+                          reply_handler=None, error_handler=None):
+        """
+        Get a list of packages, based on a package pkg_filter
+        it will return an array of (pkg_id, {field: value}) with all
+        fields, a field with no value is an empty byte array (ay)
+        :param pkg_filter: pkg pkg_filter string ('installed','updates' etc)
+        :param fields: list of package attributes to get
+        :param sender:
+        """
+        self.working_start(sender, write=False)
+        self.run_in_worker(reply_handler, error_handler,
+                           self.get_packages_native, pkg_filter, fields)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='sas',
+                         out_signature='s',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetPackagesChunked(self, pkg_filter, fields, sender=None,
+                           reply_handler=None, error_handler=None):
+        """
+        Get a list of packages, based on a package pkg_filter, in chunks
+        it will return a handle at once, the packages are send in
+        PackageChunk signals with the handle, a null chunk ends the result
+        :param pkg_filter: pkg pkg_filter string ('installed','updates' etc)
+        :param fields: list of package attributes to get
+        :param sender:
+        """
         self.working_start(sender, write=False)
-        value = self.get_packages(pkg_filter, fields)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler,
+                           self.get_packages_chunked, pkg_filter, fields)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='sassii',
+                         out_signature='s',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetPackagesPaged(self, pkg_filter, fields, sort_key, offset, limit,
+                         sender=None, reply_handler=None, error_handler=None):
+        """
+        Get a page of packages, based on a package pkg_filter
+        it will return a dict with cursor, total & packages in JSON format
+        the cursor can be used with GetPackagesPage to get the other pages
+        :param pkg_filter: pkg pkg_filter string ('installed','updates' etc)
+        :param fields: list of package attributes to get
+        :param sort_key: package attribute to sort by ('' = no sorting),
+                         see dnfdaemon.server.SORT_KEYS
+        :param offset: index of the first package in the page
+        :param limit: max. number of packages in the page
+        :param sender:
+        """
+        self.working_start(sender, write=False)
+        self.run_in_worker(reply_handler, error_handler,
+                           self.get_packages_paged, pkg_filter, fields,
+                           sort_key, offset, limit, sender)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='sii',
+                         out_signature='s',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetPackagesPage(self, cursor, offset, limit, sender=None,
+                        reply_handler=None, error_handler=None):
+        """
+        Get a page of packages from a cursor returned by GetPackagesPaged
+        it will return None in JSON format, if the cursor is expired
+        :param cursor: cursor from GetPackagesPaged
+        :param offset: index of the first package in the page
+        :param limit: max. number of packages in the page
+        :param sender:
+        """
+        self.working_start(sender, write=False)
+        self.run_in_worker(reply_handler, error_handler,
+                           self.get_packages_page, cursor, offset, limit)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='sasb',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GetPackagesByName(self, name, attrs, newest_only, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetPackagesByName(self, name, attrs, newest_only, sender=None,
+                          reply_handler=None, error_handler=None):
         """
         Get a list of packages from a name pattern
         :param name: name pattern
@@ -251,16 +374,40 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :param attrs: list of package attributes to get
         :param sender:
         """
+        self.run_query(sender, reply_handler, error_handler,
+                       'get_packages_by_name_with_attr', name, attrs,
+                       newest_only)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='sasb',
+                         out_signature='a(sa{sv})',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetPackagesByNameNative(self, name, attrs, newest_only, sender=None,
+                                reply_handler=None, error_handler=None):
+        """
+        Get a list of packages from a name pattern
+        it will return an array of (pkg_id, {attr: value}) with all
+        attributes, an attribute with no value is an empty byte array (ay)
+        :param name: name pattern
+        :param newest_only: True = get newest packages only
+        :param attrs: list of package attributes to get
+        :param sender:
+        """
         self.working_start(sender, write=False)
-        values = self.get_packages_by_name_with_attr(name, attrs, newest_only)
-        return self.working_ended(values)
+        self.run_in_worker(reply_handler, error_handler,
+                           self.get_packages_by_name_native, name, attrs,
+                           newest_only)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='ss',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GetAttribute(self, pkg_id, attr, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetAttribute(self, pkg_id, attr, sender=None, reply_handler=None,
+                     error_handler=None):
         """
         Get an attribute from a yum package pkg_id
         it will return a python repr string of the attribute
@@ -269,16 +416,37 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
                      changelog etc..)
         :param sender:
         """
+        self.run_query(sender, reply_handler, error_handler, 'get_attribute',
+                       pkg_id, attr)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='asas',
+                         out_signature='s',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetAttributes(self, pkg_ids, attrs, sender=None, reply_handler=None,
+                      error_handler=None):
+        """
+        Get a list of attributes for a list of yum package pkg_ids
+        it will return a dict of pkg_id -> {attr: value} in JSON format
+        :param pkg_ids: list of yum package pkg_ids
+        :param attrs: list of attribute names (summary, size, description,
+                      changelog etc..)
+        :param sender:
+        """
         self.working_start(sender, write=False)
-        value = self.get_attribute(pkg_id, attr)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.get_attributes,
+                           pkg_ids, attrs)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='i',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GetHistoryPackages(self, tid, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetHistoryPackages(self, tid, sender=None, reply_handler=None,
+                           error_handler=None):
         """
         Get packages from a given yum history transaction id
 
@@ -288,29 +456,33 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :rtype: json encoded string
         """
         self.working_start(sender, write=False)
-        value = self.get_history_transaction_pkgs(tid)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler,
+                           self.get_history_transaction_pkgs, tid)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='i',
                          out_signature='s',
-                         sender_keyword='sender')
-    def HistoryUndo(self, tid, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def HistoryUndo(self, tid, sender=None, reply_handler=None,
+                    error_handler=None):
         """Get packages from a given yum history transaction id.
 
         tid: history transaction id
         """
         self.working_start(sender, write=False)
-        value = self.history_undo(tid)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.history_undo,
+                           tid)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='ii',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GetHistoryByDays(self, start_days, end_days, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetHistoryByDays(self, start_days, end_days, sender=None,
+                         reply_handler=None, error_handler=None):
         """
         Get History transaction in a interval of days from today
 
@@ -322,15 +494,17 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :type sender: json encoded string
         """
         self.working_start(sender, write=False)
-        value = self.get_history_by_days(start_days, end_days)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler,
+                           self.get_history_by_days, start_days, end_days)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='as',
                          out_signature='s',
-                         sender_keyword='sender')
-    def HistorySearch(self, pattern, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def HistorySearch(self, pattern, sender=None, reply_handler=None,
+                      error_handler=None):
         """
         Search the history for transaction matching a pattern
         :param pattern: patterne to match
@@ -339,29 +513,33 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :type sender: json encoded string
         """
         self.working_start(sender, write=False)
-        value = self.history_search(pattern)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.history_search,
+                           pattern)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='',
                          out_signature='b',
-                         sender_keyword='sender')
-    def Unlock(self, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def Unlock(self, sender=None, reply_handler=None, error_handler=None):
         """ release the lock"""
         self.check_permission_read(sender)
         if self.check_lock(sender):
-            self._reset_base()
             logger.info('UNLOCK: Lock Release by %s' % self._lock)
             self._lock = None
-            return True
+            # park the base for the next client (--base-cache)
+            self.run_in_worker(lambda: reply_handler(True), error_handler,
+                               self._reset_base, True)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='s',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GroupInstall(self, cmds, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GroupInstall(self, cmds, sender=None, reply_handler=None,
+                     error_handler=None):
         """
         Install groups based on command patterns separated by spaces
         sinulate what 'dnf group install <arguments>' does
@@ -369,15 +547,17 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :param sender:
         """
         self.working_start(sender)
-        value = self.group_install(cmds)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.group_install,
+                           cmds)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='s',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GroupRemove(self, cmds, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GroupRemove(self, cmds, sender=None, reply_handler=None,
+                    error_handler=None):
         """
         Install groups based on command patterns separated by spaces
         sinulate what 'dnf group install <arguments>' does
@@ -385,15 +565,17 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :param sender:
         """
         self.working_start(sender)
-        value = self.group_remove(cmds)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.group_remove,
+                           cmds)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='s',
                          out_signature='s',
-                         sender_keyword='sender')
-    def Install(self, cmds, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def Install(self, cmds, sender=None, reply_handler=None,
+                error_handler=None):
         """
         Install packages based on command patterns separated by spaces
         sinulate what 'yum install <arguments>' does
@@ -401,15 +583,16 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :param sender:
         """
         self.working_start(sender)
-        value = self.install(cmds)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.install, cmds)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='s',
                          out_signature='s',
-                         sender_keyword='sender')
-    def Remove(self, cmds, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def Remove(self, cmds, sender=None, reply_handler=None,
+               error_handler=None):
         """
         Remove packages based on command patterns separated by spaces
         sinulate what 'yum remove <arguments>' does
@@ -417,15 +600,16 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :param sender:
         """
         self.working_start(sender)
-        value = self.remove(cmds)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.remove, cmds)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='s',
                          out_signature='s',
-                         sender_keyword='sender')
-    def Update(self, cmds, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def Update(self, cmds, sender=None, reply_handler=None,
+               error_handler=None):
         """
         Update packages based on command patterns separated by spaces
         sinulate what 'yum update <arguments>' does
@@ -433,15 +617,16 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :param sender:
         """
         self.working_start(sender)
-        value = self.update(cmds)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.update, cmds)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='s',
                          out_signature='s',
-                         sender_keyword='sender')
-    def Reinstall(self, cmds, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def Reinstall(self, cmds, sender=None, reply_handler=None,
+                  error_handler=None):
         """
         Reinstall packages based on command patterns separated by spaces
         sinulate what 'yum reinstall <arguments>' does
@@ -449,15 +634,16 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :param sender:
         """
         self.working_start(sender)
-        value = self.reinstall(cmds)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.reinstall, cmds)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='s',
                          out_signature='s',
-                         sender_keyword='sender')
-    def Downgrade(self, cmds, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def Downgrade(self, cmds, sender=None, reply_handler=None,
+                  error_handler=None):
         """
         Downgrade packages based on command patterns separated by spaces
         sinulate what 'yum downgrade <arguments>' does
@@ -465,15 +651,16 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :param sender:
         """
         self.working_start(sender)
-        value = self.downgrade(cmds)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.downgrade, cmds)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='ss',
                          out_signature='s',
-                         sender_keyword='sender')
-    def AddTransaction(self, pkg_id, action, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def AddTransaction(self, pkg_id, action, sender=None, reply_handler=None,
+                       error_handler=None):
         """
         Add an package to the current transaction
 
@@ -482,68 +669,73 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
                        obsolete, reinstall, downgrade, localinstall )
         """
         self.working_start(sender, write=False)
-        value = self.add_transaction(pkg_id, action)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.add_transaction,
+                           pkg_id, action)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='',
                          out_signature='',
-                         sender_keyword='sender')
-    def ClearTransaction(self, sender):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def ClearTransaction(self, sender, reply_handler=None, error_handler=None):
         """
         Clear the transactopm
         """
         self.working_start(sender, write=False)
-        self.clear_transaction()
-        return self.working_ended()
+        self.run_in_worker(reply_handler, error_handler,
+                           self.clear_transaction)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GetTransaction(self, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetTransaction(self, sender=None, reply_handler=None,
+                       error_handler=None):
         """
         Return the members of the current transaction
         """
         self.working_start(sender, write=False)
-        value = self.get_transaction()
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.get_transaction)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='',
                          out_signature='s',
-                         sender_keyword='sender')
-    def BuildTransaction(self, sender):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def BuildTransaction(self, sender, reply_handler=None, error_handler=None):
         """
         Resolve dependencies of current transaction
         """
         self.working_start(sender, write=False)
-        value = self.build_transaction()
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler,
+                           self.build_transaction)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='',
                          out_signature='s',
-                         sender_keyword='sender')
-    def RunTransaction(self, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def RunTransaction(self, sender=None, reply_handler=None,
+                       error_handler=None):
         """Run the current yum transaction."""
         self.working_start(sender)
         self.check_permission_write(sender)
         self.check_lock(sender)
-        result = self.run_transaction()
-        return self.working_ended(result)
+        self.run_in_worker(reply_handler, error_handler, self.run_transaction)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='asasasbbb',
                          out_signature='s',
-                         sender_keyword='sender')
-    def Search(self, fields, keys, attrs, match_all, newest_only,
-               tags, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def Search(self, fields, keys, attrs, match_all, newest_only, tags,
+               sender=None, reply_handler=None, error_handler=None):
         """
         Search for for packages, where given fields contain given key words
         :param fields: list of fields to search in
@@ -554,30 +746,79 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :param newest_only: return only the newest version of a package
         :param tags: seach pkgtags
         """
+        self.run_query(sender, reply_handler, error_handler,
+                       'search_with_attr', fields, keys, attrs, match_all,
+                       newest_only, tags)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='asasasbbb',
+                         out_signature='a(sa{sv})',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def SearchNative(self, fields, keys, attrs, match_all, newest_only, tags,
+                     sender=None, reply_handler=None, error_handler=None):
+        """
+        Search for packages, where given fields contain given key words
+        it will return an array of (pkg_id, {attr: value}) with all
+        attributes, an attribute with no value is an empty byte array (ay)
+        :param fields: list of fields to search in
+        :param keys: list of keywords to search for
+        :param attrs: list of extra attributes to get
+        :param match_all: match all flag, if True return only packages
+                          matching all keys
+        :param newest_only: return only the newest version of a package
+        :param tags: seach pkgtags
+        """
         self.working_start(sender, write=False)
-        result = self.search_with_attr(
-            fields, keys, attrs, match_all, newest_only, tags)
-        return self.working_ended(result)
+        self.run_in_worker(reply_handler, error_handler, self.search_native,
+                           fields, keys, attrs, match_all, newest_only, tags)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='asasasbbb',
+                         out_signature='s',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def SearchChunked(self, fields, keys, attrs, match_all, newest_only, tags,
+                      sender=None, reply_handler=None, error_handler=None):
+        """
+        Search for packages, where given fields contain given key words
+        it will return a handle at once, the packages are send in
+        PackageChunk signals with the handle, a null chunk ends the result
+        :param fields: list of fields to search in
+        :param keys: list of keywords to search for
+        :param attrs: list of extra attributes to get
+        :param match_all: match all flag, if True return only packages
+                          matching all keys
+        :param newest_only: return only the newest version of a package
+        :param tags: seach pkgtags
+        """
+        self.working_start(sender, write=False)
+        self.run_in_worker(reply_handler, error_handler, self.search_chunked,
+                           fields, keys, attrs, match_all, newest_only, tags)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GetGroups(self, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetGroups(self, sender=None, reply_handler=None, error_handler=None):
         """
         Return a category/group tree
         """
         self.working_start(sender, write=False)
-        value = self.get_groups()
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.get_groups)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
                          in_signature='ssas',
                          out_signature='s',
-                         sender_keyword='sender')
-    def GetGroupPackages(self, grp_id, grp_flt, fields, sender=None):
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetGroupPackages(self, grp_id, grp_flt, fields, sender=None,
+                         reply_handler=None, error_handler=None):
         """
         Get packages in a group by grp_id and grp_flt
         :param grp_id: The Group id
@@ -586,8 +827,29 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         :param sender:
         """
         self.working_start(sender, write=False)
-        value = self.get_group_pkgs(grp_id, grp_flt, fields)
-        return self.working_ended(value)
+        self.run_in_worker(reply_handler, error_handler, self.get_group_pkgs,
+                           grp_id, grp_flt, fields)
+
+    @Logger
+    @dbus.service.method(DAEMON_INTERFACE,
+                         in_signature='ssas',
+                         out_signature='a(sa{sv})',
+                         sender_keyword='sender',
+                         async_callbacks=('reply_handler', 'error_handler'))
+    def GetGroupPackagesNative(self, grp_id, grp_flt, fields, sender=None,
+                               reply_handler=None, error_handler=None):
+        """
+        Get packages in a group by grp_id and grp_flt
+        it will return an array of (pkg_id, {field: value}) with all
+        fields, a field with no value is an empty byte array (ay)
+        :param grp_id: The Group id
+        :param grp_flt: Group Filter (all or default)
+        :param fields: list of package attributes to include in list
+        :param sender:
+        """
+        self.working_start(sender, write=False)
+        self.run_in_worker(reply_handler, error_handler,
+                           self.get_group_pkgs_native, grp_id, grp_flt, fields)
 
     @Logger
     @dbus.service.method(DAEMON_INTERFACE,
@@ -610,31 +872,49 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
 #=========================================================================
 # DBus signals
 #=========================================================================
+    @MainLoopSignal
+    @dbus.service.signal(DAEMON_INTERFACE)
+    def PackageChunk(self, handle, chunk):
+        """ A chunk of packages for GetPackagesChunked/SearchChunked """
+        pass
+
+    @MainLoopSignal
+    @dbus.service.signal(DAEMON_INTERFACE)
+    def BaseReady(self, ok):
+        """ Loading of the package sack started by --warmup ended """
+        pass
+
 # Parallel Download Progress signals
+    @MainLoopSignal
     @dbus.service.signal(DAEMON_INTERFACE)
     def ErrorMessage(self, error_msg):
         """ Send an error message """
         pass
 
+    @MainLoopSignal
     @dbus.service.signal(DAEMON_INTERFACE)
     def DownloadStart(self, num_files, num_bytes):
         """ Starting a new parallel download batch """
         pass
 
+    @MainLoopSignal
     @dbus.service.signal(DAEMON_INTERFACE)
     def DownloadProgress(self, name, frac, total_frac, total_files):
         """ Progress for a single instance in the batch """
         pass
 
+    @MainLoopSignal
     @dbus.service.signal(DAEMON_INTERFACE)
     def DownloadEnd(self, name, status, msg):
         """ Download of af single instace ended """
         pass
 
+    @MainLoopSignal
     @dbus.service.signal(DAEMON_INTERFACE)
     def RepoMetaDataProgress(self, name, frac):
         """ Repository Metadata Download progress """
 
+    @MainLoopSignal
     @dbus.service.signal(DAEMON_INTERFACE)
     def TransactionEvent(self, event, data):
         """
@@ -644,12 +924,15 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         Steps are : start-run, download, pkg-to-download, signature-check,
                     run-test-transaction,
         run-transaction, verify, fail, end-run
+        signature-error is send during the download, when a signature
+        check fails (data = [pkg_id, error message])
 
         :param event: current step
         """
         # print "event: %s" % event
         pass
 
+    @MainLoopSignal
     @dbus.service.signal(DAEMON_INTERFACE)
     def RPMProgress(self, package, action, te_current, te_total, ts_current,
                     ts_total):
@@ -667,6 +950,7 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         """
         pass
 
+    @MainLoopSignal
     @dbus.service.signal(DAEMON_INTERFACE)
     def GPGImport(self, pkg_id, userid, hexkeyid, keyurl, timestamp):
         """
@@ -697,6 +981,21 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         self._is_working = False
         return value
 
+    def run_query(self, sender, reply_handler, error_handler, method, *args):
+        """
+        Run a read-only query method
+        The lock holder is served by the worker, other senders are served
+        by the query pool, when it is enabled (--query-workers)
+        :param method: name of the daemon method to run
+        """
+        if self._pool_size and self._lock != sender:
+            self.check_permission_read(sender)
+            self.run_in_pool(reply_handler, error_handler, method, *args)
+        else:
+            self.working_start(sender, write=False)
+            self.run_in_worker(reply_handler, error_handler,
+                               getattr(self, method), *args)
+
     def check_lock(self, sender):
         """
         Check that the current sender is owning the dnf lock
@@ -709,19 +1008,32 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
 
     def check_permission_write(self, sender):
         """ Check for senders permission to update system packages"""
-        if sender in self.authorized_sender_write:
+        if self._is_authorized(self.authorized_sender_write, sender):
             return
         else:
             self._check_permission(sender, 'org.baseurl.DnfSystem.write')
-            self.authorized_sender_write.add(sender)
+            self._set_authorized(self.authorized_sender_write, sender)
 
     def check_permission_read(self, sender):
         """ Check for senders permission to read system packages"""
-        if sender in self.authorized_sender_read:
+        if self._is_authorized(self.authorized_sender_read, sender):
             return
         else:
             self._check_permission(sender, 'org.baseurl.DnfSystem.read')
-            self.authorized_sender_read.add(sender)
+            self._set_authorized(self.authorized_sender_read, sender)
+
+    def _get_polkit(self):
+        """ Get the PolicyKit1 Authority proxy, it is shared by all checks
+        """
+        if not self._polkit:
+            # follow a restart of PolicyKit
+            obj = self._bus.get_object(
+                'org.freedesktop.PolicyKit1',
+                '/org/freedesktop/PolicyKit1/Authority',
+                follow_name_owner_changes=True)
+            self._polkit = dbus.Interface(
+                obj, 'org.freedesktop.PolicyKit1.Authority')
+        return self._polkit
 
     def _check_permission(self, sender, action):
         """ Check senders permissions using PolicyKit1
@@ -729,10 +1041,7 @@ class DnfDaemon(dnfdaemon.server.DnfDaemonBase):
         if not sender:
             raise ValueError('sender == None')
 
-        obj = dbus.SystemBus().get_object(
-            'org.freedesktop.PolicyKit1',
-            '/org/freedesktop/PolicyKit1/Authority')
-        obj = dbus.Interface(obj, 'org.freedesktop.PolicyKit1.Authority')
+        obj = self._get_polkit()
         (granted, _, details) = obj.CheckAuthorization(
             ('system-bus-name', {'name': sender}), action, {},
             dbus.UInt32(1), '', timeout=600)
@@ -745,6 +1054,23 @@ def main():
     parser.add_argument('-v', '--verbose', action='store_true')
     parser.add_argument('-d', '--debug', action='store_true')
     parser.add_argument('--notimeout', action='store_true')
+    parser.add_argument('--warmup', action='store_true',
+                        help='load the package sack at startup')
+    parser.add_argument('--base-cache', type=int, default=0, metavar='MB',
+                        help='memory for keeping loaded package sacks for '
+                             'other repo & config combinations')
+    parser.add_argument('--load-workers', type=int, default=0, metavar='N',
+                        help='load the repository metadata in N processes')
+    parser.add_argument('--progress-rate', type=int, default=0,
+                        metavar='HZ',
+                        help='max. progress signals per second for each '
+                             'package (0 = send all)')
+    parser.add_argument('--sig-workers', type=int, default=0, metavar='N',
+                        help='check the package signatures in N processes')
+    parser.add_argument('--query-workers', type=int, default=0,
+                        metavar='N',
+                        help='serve read-only queries from clients not '
+                             'holding the lock in N processes')
     args = parser.parse_args()
     if args.verbose:
         if args.debug:
@@ -755,7 +1081,16 @@ def main():
 
     # setup the DBus mainloop
     dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
+    dbus.mainloop.glib.threads_init()
     yd = DnfDaemon()
+    yd._setup_worker()
+    yd._setup_base_cache(args.base_cache)
+    yd._setup_load_workers(args.load_workers)
+    yd._setup_progress_rate(args.progress_rate)
+    yd._setup_sig_workers(args.sig_workers)
+    yd._setup_query_pool(args.query_workers)
+    if args.warmup:
+        yd.start_warmup()
     if not args.notimeout:
         yd._setup_watchdog()
     yd.mainloop_run()
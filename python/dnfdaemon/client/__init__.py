@@ -96,11 +96,19 @@ Usage: (Make your own subclass based on
            # do stuff here
            pass
 
+The package lists from GetPackages, GetPackagesByName, GetGroupPackages
+and Search are send from the daemon as a JSON string by default. Set
+the ``result_format`` attribute to ``'native'`` to get them as native
+D-Bus types, it is faster for large lists and the methods return the
+same lists (None is send as an empty byte array and returned as None).
+
 """
 
+import collections
 import json
 import sys
 import re
+import time
 import weakref
 import logging
 
@@ -118,6 +126,14 @@ INTERFACE_READONLY = ORG_READONLY
 
 DBUS_ERR_RE = re.compile('.*GDBus.Error:([\w\.]*): (.*)$')
 
+# secs. to wait for the next chunk of a chunked result
+CHUNK_TIMEOUT = 120
+# number of unknown handles to keep the chunks for, the chunks can arrive
+# before the handle is returned by the daemon (the rest is for other clients)
+MAX_UNKNOWN_HANDLES = 16
+# max. number of chunks kept for an unknown handle
+MAX_UNKNOWN_CHUNKS = 64
+
 #
 # Exceptions
 #
@@ -177,6 +193,28 @@ class DBus:
         )
 
 
+def _unpack_native(variant):
+    '''Unpack a GVariant from a Native method, an empty byte array (ay)
+    is None'''
+    type_string = variant.get_type_string()
+    if type_string == 'ay':
+        return None
+    elif type_string == 'v':
+        return _unpack_native(variant.get_variant())
+    elif type_string[0] not in 'a(':
+        return variant.unpack()
+    children = [variant.get_child_value(i)
+                for i in range(variant.n_children())]
+    if type_string.startswith('a{'):
+        return dict((entry.get_child_value(0).unpack(),
+                     _unpack_native(entry.get_child_value(1)))
+                    for entry in children)
+    elif type_string.startswith('a'):
+        return [_unpack_native(child) for child in children]
+    else:
+        return tuple(_unpack_native(child) for child in children)
+
+
 class WeakMethod:
     ''' Helper class to work with a weakref class method '''
     def __init__(self, inst, method):
@@ -198,10 +236,21 @@ session = DBus(Gio.bus_get_sync(Gio.BusType.SESSION, None))
 
 class DnfDaemonBase:
 
+    # Format used by the daemon for the package lists returned by
+    # GetPackages, GetPackagesByName, GetGroupPackages & Search
+    # 'json' = JSON string, 'native' = D-Bus array of (pkg_id, {attr: value})
+    # The methods return the same lists for both formats.
+    result_format = 'json'
+
     def __init__(self, bus, org, interface):
         self.bus = bus
         self.dbus_org = org
         self.dbus_interface = interface
+        self._chunks = {}  # handle -> pending chunks for a chunked result
+        # handle -> chunks (JSON) received before the handle was known,
+        # None if there were too many
+        self._unknown_chunks = collections.OrderedDict()
+        self._chunk_calls = 0  # chunked calls waiting for the handle
         self.daemon = self._get_daemon(bus, org, interface)
         logger.debug("%s daemon loaded - version :  %s" %
                      (interface, self.daemon.GetVersion()))
@@ -225,7 +274,82 @@ class DnfDaemonBase:
     def _on_g_signal(self, proxy, sender, signal, params):
         '''DBUS signal Handler '''
         args = params.unpack()  # unpack the glib variant
-        self.handle_dbus_signals(proxy, sender, signal, args)
+        if signal == 'PackageChunk':
+            self._on_package_chunk(*args)
+        else:
+            self.handle_dbus_signals(proxy, sender, signal, args)
+
+    def _on_package_chunk(self, handle, chunk):
+        '''Store a chunk of a chunked result, until it is read'''
+        if handle in self._chunks:
+            self._chunks[handle].append(json.loads(chunk))
+        elif self._chunk_calls:  # the handle might not be returned yet
+            chunks = self._unknown_chunks.setdefault(handle, [])
+            if chunks is None:  # too many, for another client
+                return
+            if len(chunks) < MAX_UNKNOWN_CHUNKS:
+                chunks.append(chunk)
+            else:
+                self._unknown_chunks[handle] = None
+            if len(self._unknown_chunks) > MAX_UNKNOWN_HANDLES:
+                self._unknown_chunks.popitem(last=False)
+        # else the chunk is for another client
+
+    def _run_dbus_chunked(self, cmd, signature, *args):
+        '''Call a DBus method returning a chunked result, and return a
+        generator for the rows of the result.
+        '''
+        self._chunk_calls += 1
+        try:
+            handle = self._run_dbus_async(cmd, signature, *args)
+            return self._get_chunks(handle)
+        finally:
+            self._chunk_calls -= 1
+            if not self._chunk_calls:  # the rest is for other clients
+                self._unknown_chunks.clear()
+
+    def _get_chunks(self, handle):
+        '''Get a generator for the rows of a chunked result'''
+        chunks = self._unknown_chunks.pop(handle, [])
+        if chunks is None:
+            raise DaemonError('Too many chunks before the result handle')
+        pending = collections.deque(json.loads(chunk) for chunk in chunks)
+        self._chunks[handle] = pending
+        return self._iter_chunks(handle, pending)
+
+    def _wait_chunk(self, pending):
+        '''Run the main loop until a chunk arrives
+
+        Raise DaemonError, if the daemon exits or no chunk arrives in
+        CHUNK_TIMEOUT secs.
+        '''
+        context = GLib.MainContext.default()
+        deadline = time.time() + CHUNK_TIMEOUT
+        # wake up the loop every sec. to check the daemon and the timeout
+        source = GLib.timeout_add(1000, lambda: True)
+        try:
+            while not pending:
+                if self.daemon.get_name_owner() is None:
+                    raise DaemonError('The daemon has exited')
+                if time.time() > deadline:
+                    raise DaemonError('Timeout waiting for the result')
+                context.iteration(True)
+        finally:
+            GLib.source_remove(source)
+
+    def _iter_chunks(self, handle, pending):
+        '''Yield the rows of a chunked result, when the chunks arrive'''
+        try:
+            while True:
+                if not pending:
+                    self._wait_chunk(pending)
+                chunk = pending.popleft()
+                if chunk is None:  # end of result
+                    break
+                for row in chunk:
+                    yield row
+        finally:
+            del self._chunks[handle]
 
     def handle_dbus_signals(self, proxy, sender, signal, args):
         """ Overload in child class """
@@ -293,6 +417,46 @@ class DnfDaemonBase:
         result = self._get_result(data)
         return result
 
+    def _run_dbus_packages(self, cmd, signature, attrs, *args):
+        '''Call a DBus method returning a package list in the current
+        result format, and return the package list.
+
+        cmd: JSON version of the method, cmd + 'Native' is the native one
+        attrs: the package attributes in the result
+        '''
+        if self.result_format == 'native':
+            result = self._run_dbus_native(cmd + 'Native', signature, *args)
+            if not attrs:
+                return [pkg_id for pkg_id, values in result]
+            return [[pkg_id] + [values.get(attr) for attr in attrs]
+                    for pkg_id, values in result]
+        else:
+            return json.loads(self._run_dbus_async(cmd, signature, *args))
+
+    def _run_dbus_native(self, cmd, signature, *args):
+        '''Make an async call to a Native DBus method in the yumdaemon
+        service, the result is unpacked with None values
+
+        cmd: method to run
+        signature: signature of the arguments
+        '''
+        main_loop = GLib.MainLoop()
+        data = {'main_loop': main_loop}
+
+        def handler(proxy, res, data):
+            try:
+                result = _unpack_native(proxy.call_finish(res))[0]
+            except Exception as err:
+                result = err
+            self._return_handler(proxy, result, data)
+
+        # timeout = infinite
+        self.daemon.call(cmd, GLib.Variant(signature, args),
+                         Gio.DBusCallFlags.NONE, GObject.G_MAXINT, None,
+                         handler, data)
+        data['main_loop'].run()
+        return self._get_result(data)
+
     def _run_dbus_sync(self, cmd, *args):
         '''Make a sync call to a DBus method in the yumdaemon service
         cmd:
@@ -392,8 +556,64 @@ class DnfDaemonBase:
                                'updates','obsoletes','recent','extras')
             fields: yum package objects attributes to get.
         '''
+        return self._run_dbus_packages(
+            'GetPackages', '(sas)', fields, pkg_filter, fields)
+
+    def GetPackagesChunked(self, pkg_filter, fields=[]):
+        '''Get a generator of pkg lists for a given package filter
+
+        The packages are send from the daemon in chunks, so the first
+        packages can be used, before all packages are found.
+
+        Args:
+            pkg_filter: package filter ('installed','available',
+                               'updates','obsoletes','recent','extras')
+            fields: yum package objects attributes to get.
+
+        Returns:
+            generator of pkg_id or [pkg_id, field1, ...] if fields is set
+        '''
+        return self._run_dbus_chunked(
+            'GetPackagesChunked', '(sas)', pkg_filter, fields)
+
+    def GetPackagesPaged(self, pkg_filter, fields=[], sort_key='',
+                         offset=0, limit=100):
+        '''Get the first page of pkg lists for a given package filter
+
+        The other pages can be read with GetPackagesPage using
+        the returned cursor.
+
+        Args:
+            pkg_filter: package filter ('installed','available',
+                               'updates','obsoletes','recent','extras')
+            fields: yum package objects attributes to get.
+            sort_key: package attribute to sort by ('' = no sorting)
+            offset: index of the first package in the page
+            limit: max. number of packages in the page
+
+        Returns:
+            dict with 'cursor', 'total' (number of packages) and
+            'packages' (list of [pkg_id, field1, ...])
+        '''
+        result = self._run_dbus_async(
+            'GetPackagesPaged', '(sassii)', pkg_filter, fields, sort_key,
+            offset, limit)
+        return json.loads(result)
+
+    def GetPackagesPage(self, cursor, offset, limit=100):
+        '''Get a page of pkg lists from a cursor made by GetPackagesPaged
+
+        Args:
+            cursor: the cursor returned by GetPackagesPaged
+            offset: index of the first package in the page
+            limit: max. number of packages in the page
+
+        Returns:
+            dict with 'cursor', 'total' and 'packages' or None if
+            the cursor is expired
+        '''
         result = self._run_dbus_async(
-            'GetPackages', '(sas)', pkg_filter, fields)
+            'GetPackagesPage', '(sii)', cursor, offset, limit)
         return json.loads(result)
 
     def ExpireCache(self):
@@ -401,6 +621,18 @@ class DnfDaemonBase:
         rc = self._run_dbus_async('ExpireCache', '()')
         return rc
 
+    def RefreshCache(self):
+        '''Refresh the dnf metadata of the enabled repositories
+
+        Only the metadata there has changed is downloaded and the
+        package sack is only loaded again, if something has changed.
+
+        Returns:
+            dict with repo_id : 'updated', 'unchanged' or 'failed'
+        '''
+        result = self._run_dbus_async('RefreshCache', '()')
+        return json.loads(result)
+
     def GetRepositories(self, repo_filter):
         '''Get a list of repository ids where name matches a filter
 
@@ -458,6 +690,21 @@ class DnfDaemonBase:
             result = json.loads(result)
         return result
 
+    def GetAttributes(self, pkg_ids, attrs):
+        '''Get yum package attributes for a list of packages in one call
+
+        Args:
+            pkg_ids: list of pkg_ids to get attributes from
+            attrs: list of attribute names to get
+
+        Returns:
+            dict of pkg_id -> {attr: value, ...}
+            (pkg_id -> None if the package is not found)
+        '''
+        result = self._run_dbus_async('GetAttributes', '(asas)',
+                                      pkg_ids, attrs)
+        return json.loads(result)
+
     def GetPackagesByName(self, name, attr=[], newest_only=True):
         '''Get a list of pkg ids for starts with name
 
@@ -470,8 +717,8 @@ class DnfDaemonBase:
         Returns:
             list of [pkg_id, attr1, attr2, ...]
         '''
-        return json.loads(self._run_dbus_async('GetPackagesByName', '(sasb)',
-                          name, attr, newest_only))
+        return self._run_dbus_packages('GetPackagesByName', '(sasb)', attr,
+                                       name, attr, newest_only)
 
     def GetGroups(self):
         '''Get list of Groups. '''
@@ -487,8 +734,8 @@ class DnfDaemonBase:
                      the group is installed)
             fields: extra package attributes to include in result
         '''
-        return json.loads(self._run_dbus_async('GetGroupPackages', '(ssas)',
-                          grp_id, grp_flt, fields))
+        return self._run_dbus_packages('GetGroupPackages', '(ssas)', fields,
+                                       grp_id, grp_flt, fields)
 
     def Search(self, fields, keys, attrs, match_all, newest_only, tags):
         '''Search for packages where keys is matched in fields
@@ -504,8 +751,29 @@ class DnfDaemonBase:
         Returns:
             list of pkg_id's
         '''
-        return json.loads(self._run_dbus_async('Search', '(asasasbbb)',
-                          fields, keys, attrs, match_all, newest_only, tags))
+        return self._run_dbus_packages('Search', '(asasasbbb)', attrs,
+                                       fields, keys, attrs, match_all,
+                                       newest_only, tags)
+
+    def SearchChunked(self, fields, keys, attrs, match_all, newest_only,
+                      tags):
+        '''Search for packages where keys is matched in fields, the
+        result is send from the daemon in chunks.
+
+        Args:
+            fields: yum po attributes to search in
+            keys: keys to search for
+            attrs: list of extra package attributes to get
+            match_all: match all keys or only one
+            newest_only: return only the newest version of packages
+            tags: search pkgtags
+
+        Returns:
+            generator of pkg_id or [pkg_id, attr1, ...] if attrs is set
+        '''
+        return self._run_dbus_chunked('SearchChunked', '(asasasbbb)',
+                                      fields, keys, attrs, match_all,
+                                      newest_only, tags)
 
     def Exit(self):
         '''End the daemon'''
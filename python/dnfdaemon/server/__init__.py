@@ -36,13 +36,21 @@ import dnf.callback
 import dnf.comps
 import dnf.subject
 import dnf.transaction
+import collections
+import concurrent.futures
 import dnf.yum
 import functools
 import hawkey
+import itertools
 import json
 import logging
+import multiprocessing
 import operator
+import os
 import sys
+import threading
+import time
+import uuid
 
 API_VERSION = 2  # API Version must be bumped at API changes
 MAINLOOP = GLib.MainLoop()
@@ -54,6 +62,23 @@ FAKE_ATTR = ['downgrades', 'action', 'pkgtags',
 
 NONE = json.dumps(None)
 
+# Package filters supported by get_packages
+PKG_FILTERS = ['installed', 'available', 'updates', 'obsoletes',
+               'recent', 'extras', 'updates_all']
+
+# package attributes get_packages_paged can sort by (str or int values)
+SORT_KEYS = ['name', 'epoch', 'version', 'release', 'arch', 'reponame',
+             'summary', 'license', 'url', 'sourcerpm', 'size',
+             'downloadsize', 'installsize', 'buildtime', 'installtime']
+
+# seconds a cursor for get_packages_paged is kept after the last use
+CURSOR_TIMEOUT = 300
+# max. number of cursors kept for each client
+MAX_CURSORS = 10
+
+# max. number of packages in a PackageChunk signal
+CHUNK_SIZE = 500
+
 _ACTIVE_DCT = {
     dnf.transaction.DOWNGRADE: operator.attrgetter('installed'),
     dnf.transaction.ERASE: operator.attrgetter('erased'),
@@ -73,6 +98,62 @@ def _active_pkg(tsi):
 
 logger = logging.getLogger('dnfdaemon.common')
 
+# the daemon serving the queries in the query pool processes
+_pool_daemon = None
+
+
+def _init_pool(config_options, enabled_repos):
+    """Load the sack for the daemon in a query pool process.
+
+    The processes are started by a fork server, so they don't inherit the
+    threads & the bus connection of the daemon. The sack is only loaded
+    from the metadata cached by the daemon, with its enabled repos &
+    options.
+    """
+    global _pool_daemon
+    _pool_daemon = _PoolDaemon()
+    _pool_daemon._config_options = config_options
+    _pool_daemon._enabled_repos = enabled_repos
+    _pool_daemon.base
+
+
+def _pool_call(method, *args):
+    """Run a read-only daemon method in a query pool process."""
+    return getattr(_pool_daemon, method)(*args)
+
+
+def _to_dbus(value):
+    """Convert an attribute value to a value for a D-Bus variant.
+
+    None can't be send, it is send as an empty byte array (ay), which is
+    not used for any other value.
+    """
+    if isinstance(value, (list, tuple)):
+        return dbus.Array([_to_dbus(v) for v in value], signature='v')
+    elif isinstance(value, dict):
+        return dbus.Dictionary(
+            dict((str(k), _to_dbus(v)) for k, v in value.items()),
+            signature='sv')
+    elif isinstance(value, bool):
+        return dbus.Boolean(value)
+    elif isinstance(value, int):
+        return dbus.Int64(value)
+    elif isinstance(value, float):
+        return dbus.Double(value)
+    elif value is None:
+        return dbus.Array([], signature='y')
+    else:
+        return dbus.String(value)
+
+
+def _get_rss():
+    """Get the resident memory of the daemon in bytes, 0 if not known."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError, IndexError):
+        return 0
+
 
 def Logger(func):
     """
@@ -89,6 +170,26 @@ def Logger(func):
     newFunc.__dict__.update(func.__dict__)
     return newFunc
 
+
+def MainLoopSignal(func):
+    """
+    This decorator send a signal from the main loop, when it is emitted
+    from the worker thread
+    """
+    def newFunc(*args, **kwargs):
+        if threading.current_thread() is threading.main_thread():
+            func(*args, **kwargs)
+        else:
+            def emit():
+                func(*args, **kwargs)
+                return False
+            GLib.idle_add(emit)
+
+    newFunc.__name__ = func.__name__
+    newFunc.__doc__ = func.__doc__
+    newFunc.__dict__.update(func.__dict__)
+    return newFunc
+
 # Exceptions
 
 
@@ -134,8 +235,11 @@ class TransactionProgress(dnf.callback.TransactionProgress):
                 pkg_id = package
             if action in self.actions:
                 action = self.actions[action]
-            self.base.RPMProgress(
-                pkg_id, action, te_current, te_total, ts_current, ts_total)
+            # the start & end of an element is send at once
+            self.base._send_progress(
+                ('rpm', pkg_id), 'RPMProgress',
+                pkg_id, action, te_current, te_total, ts_current, ts_total,
+                now=te_current == 0 or te_current >= te_total)
 
 
 class DownloadCallback:
@@ -151,8 +255,10 @@ class DownloadCallback:
 
     def downloadProgress(self, name, frac, total_frac, total_files):
         """ Progress for a single instance in the batch """
-        # send a signal
-        self.DownloadProgress(name, frac, total_frac, total_files)
+        # send a signal, a finished instance at once
+        self._send_progress(('download', name), 'DownloadProgress',
+                            name, frac, total_frac, total_files,
+                            now=frac >= 1.0)
 
     def downloadEnd(self, name, status, msg):
         """ Download of af single instace ended """
@@ -160,7 +266,9 @@ class DownloadCallback:
             status = -1
         if not msg:
             msg = ""
-        self.DownloadEnd(name, status, msg)  # send a signal
+        # send a signal, replacing the pending progress
+        self._send_progress(('download', name), 'DownloadEnd',
+                            name, status, msg, now=True)
 
     def repoMetaDataProgress(self, name, frac):
         """ Repository Metadata Download progress """
@@ -171,9 +279,13 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
 
     def __init__(self):
         self.logger = logging.getLogger('dnfdaemon.base')
-        self.authorized_sender_read = set()
-        self.authorized_sender_write = set()
+        # sender -> time the PolicyKit authorization expires
+        self.authorized_sender_read = {}
+        self.authorized_sender_write = {}
+        self._auth_ttl = 300  # secs. a PolicyKit authorization is cached
         self._lock = None
+        self._name_bus = None  # bus to watch the clients disconnect on
+        self._name_watches = {}  # sender -> match for its owner changes
         self._base = None
         self._can_quit = True
         self._is_working = False
@@ -183,10 +295,31 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
         self._timeout_idle = 20
         # time to daemon is closed when locked and not working
         self._timeout_locked = 600
-        self._obsoletes_list = None     # Cache for obsoletes
         self._gpg_confirm = {}  # store confirmed gpg key import confirmations
         self._config_options = {}
         self._enabled_repos = []
+        # cursor -> (packages, pkgs, attrs, last used, sender)
+        self._cursors = {}
+        self._streams = {}  # handle -> iterator of rows to send in chunks
+        self._warmup = None  # future for the base loaded by start_warmup
+        self._worker = None  # executor running the dnf work
+        self._jobs = 0  # requests waiting for the worker
+        self._pool = None  # processes serving read-only queries
+        self._pool_size = 0
+        self._pool_lock = threading.Lock()
+        self._pool_generation = 0  # changed, when the pool is closed
+        self._base_key = None  # enabled repos & config the base is loaded for
+        self._base_size = 0  # estimated memory used by the base
+        self._base_rss = 0  # memory used by the daemon without the base
+        self._parked = collections.OrderedDict()  # key -> (base, size)
+        self._park_budget = 0  # max. memory for the parked bases
+        self._load_workers = 0  # processes loading the repos in parallel
+        self._sig_workers = 0  # processes checking signatures in parallel
+        self._progress_rate = 0  # max. progress signals per sec. (0 = all)
+        # key -> (signal, args) waiting for the next progress flush
+        self._pending_progress = collections.OrderedDict()
+        self._progress_lock = threading.RLock()
+        self._progress_timer = None
 
     # this must be overloaded in the parent class
     def GPGImport(self, pkg_id, userid, hexkeyid, keyurl, timestamp):
@@ -198,10 +331,214 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
         """
         yumbase property so we can auto initialize it if not defined
         """
+        self._wait_warmup()
         if not self._base:
             self._get_base()
         return self._base
 
+    def start_warmup(self):
+        """Start loading the dnf base and sack in the worker thread.
+
+        Requests needing the base will wait for the loading to complete,
+        and the BaseReady signal is send, when it is done.
+        """
+        if self._base or self._warmup:
+            return
+        future = concurrent.futures.Future()
+
+        def warmup():
+            try:
+                self._get_base()
+                future.set_result(True)
+            except Exception as e:
+                future.set_exception(e)
+            GLib.idle_add(self._warmup_done)
+
+        self._warmup = future
+        if self._worker:
+            self._worker.submit(warmup)
+        else:
+            thread = threading.Thread(target=warmup, name='warmup')
+            thread.daemon = True
+            thread.start()
+
+    def _wait_warmup(self):
+        """Wait for the base loaded by start_warmup, if it is loading."""
+        future = self._warmup
+        if not future:
+            return
+        self._warmup = None
+        try:
+            future.result()
+        except Exception as e:  # load it again, when it is needed
+            self.logger.error('Loading dnf base failed : %s', str(e))
+            if self._base:  # close the partly loaded base
+                self._base.close()
+            self._base = None
+
+    def _warmup_done(self):
+        """Send the BaseReady signal, called from the main loop."""
+        self._wait_warmup()
+        self.BaseReady(self._base is not None)
+        return False
+
+    def run_in_worker(self, reply_handler, error_handler, func, *args):
+        """Run func(*args) in the worker thread and reply with the result.
+
+        dnf.Base is not thread safe, so all the dnf work is done in a
+        single worker thread, while the main loop keeps handling the
+        light requests, signals and the watchdog. The reply is send from
+        the main loop, when func is done. Without a worker, func is run
+        at once.
+
+        :param reply_handler: D-Bus async callback for the result
+        :param error_handler: D-Bus async callback for an exception
+        """
+        self._jobs += 1
+        if self._worker:
+            future = self._worker.submit(func, *args)
+            future.add_done_callback(lambda future: GLib.idle_add(
+                self._send_reply, future, reply_handler, error_handler))
+        else:
+            future = concurrent.futures.Future()
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+            self._send_reply(future, reply_handler, error_handler)
+
+    def _send_reply(self, future, reply_handler, error_handler):
+        """Send the reply for a job done by the worker, called from the
+        main loop.
+        """
+        self._jobs -= 1
+        self._is_working = self._jobs > 0
+        self._watchdog_count = 0
+        try:
+            value = future.result()
+        except Exception as e:
+            error_handler(e)
+        else:
+            if value is None:
+                reply_handler()
+            else:
+                reply_handler(value)
+        return False
+
+    def _setup_worker(self):
+        """Setup the worker thread running the dnf work."""
+        self._worker = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def _setup_query_pool(self, size):
+        """Setup the number of processes in the query pool (0 = no pool)."""
+        self._pool_size = size
+
+    def run_in_pool(self, reply_handler, error_handler, method, *args):
+        """Run a read-only method in the query pool and reply with the result.
+
+        The pool processes load the sack of the daemon from the metadata
+        cache, so they serve concurrent queries from a snapshot of it,
+        while the worker is busy. The pool is started, when it is needed,
+        and closed, when the base is changed. It is started in a thread
+        for the current repos & config, so the query doesn't wait for the
+        worker, only when the daemon has not loaded the metadata yet.
+        Without a pool, the method is run in the worker.
+
+        :param method: name of the daemon method to run
+        """
+        if not self._worker or not self._pool_size:
+            self.run_in_worker(reply_handler, error_handler,
+                               getattr(self, method), *args)
+            return
+        self._jobs += 1
+        future = concurrent.futures.Future()
+        future.add_done_callback(lambda future: GLib.idle_add(
+            self._send_reply, future, reply_handler, error_handler))
+
+        def submit(pool):
+            pool.apply_async(_pool_call, (method,) + args,
+                             callback=future.set_result,
+                             error_callback=future.set_exception)
+
+        with self._pool_lock:
+            if self._pool:
+                submit(self._pool)
+                return
+            generation = self._pool_generation
+        # the snapshot of the config, the pool is started for
+        config = (dict(self._config_options), list(self._enabled_repos))
+
+        def start(load_base):
+            try:
+                if load_base:
+                    self.base  # load the metadata into the cache
+                pool, keep = self._start_pool(generation, *config)
+                submit(pool)
+                if not keep:  # the base is changed meanwhile
+                    self._stop_pool(pool)
+            except Exception as e:
+                future.set_exception(e)
+
+        if self._base and not self._warmup:
+            thread = threading.Thread(target=start, args=(False,),
+                                      name='pool-start')
+            thread.daemon = True
+            thread.start()
+        else:
+            self._worker.submit(start, True)
+
+    def _start_pool(self, generation, config_options, enabled_repos):
+        """Get the query pool, start it for a snapshot of the config.
+
+        The started pool is only kept, if it is not closed meanwhile (the
+        generation is unchanged), else it is only used for one query.
+
+        :return: (pool, keep)
+        """
+        with self._pool_lock:
+            if self._pool:
+                return self._pool, True
+        context = multiprocessing.get_context('forkserver')
+        pool = context.Pool(self._pool_size, _init_pool,
+                            (config_options, enabled_repos))
+        with self._pool_lock:
+            if not self._pool and generation == self._pool_generation:
+                self._pool = pool
+                return pool, True
+        return pool, False
+
+    def _close_pool(self):
+        """Close the query pool, the queued queries are still served."""
+        with self._pool_lock:
+            pool = self._pool
+            self._pool = None
+            self._pool_generation += 1
+        if pool:
+            self._stop_pool(pool)
+
+    @staticmethod
+    def _stop_pool(pool):
+        """Close a pool and wait for it in a thread."""
+        pool.close()
+        thread = threading.Thread(target=pool.join, name='pool-close')
+        thread.daemon = True
+        thread.start()
+
+    def _run_idle(self, func, *args):
+        """Call func(*args) until it returns False.
+
+        With a worker, func is called in the worker thread and other
+        requests can run between the calls, else it is called when the
+        main loop is idle.
+        """
+        if self._worker:
+            def run():
+                if func(*args):
+                    self._worker.submit(run)
+            self._worker.submit(run)
+        else:
+            GLib.idle_add(func, *args)
+
 #=========================================================================
 # The action methods for the DBUS API (Session & System)
 # RunTransaction -> run_transaction, etc
@@ -225,21 +562,103 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
         values = [self._get_po_list(po, attrs) for po in pkgs]
         return json.dumps(values)
 
+    def search_native(self, fields, keys, attrs, match_all, newest_only,
+                      tags):
+        """Search for packages, where given fields contain given key words
+
+        Same as search_with_attr, but the result is a D-Bus array of
+        (pkg_id, {attr: value})
+        """
+        showdups = not newest_only
+        pkgs = self.base.search(fields, keys, match_all, showdups)
+        return self._get_native_list(pkgs, attrs)
+
+    def search_chunked(self, fields, keys, attrs, match_all, newest_only,
+                       tags):
+        """Search for packages, where given fields contain given key words
+        and send the result in PackageChunk signals.
+
+        :param fields: list of fields to search in
+        :param keys: list of keywords to search for
+        :param attrs: list of extra attributes to get
+        :param match_all: match all flag, if True return only packages
+                          matching all keys
+        :param newest_only: return only the newest version of a package
+        :param tags: seach pkgtags
+        :return: handle used in the PackageChunk signals
+        """
+        showdups = not newest_only
+        pkgs = self.base.search(fields, keys, match_all, showdups)
+        return self._start_stream(pkgs, attrs)
+
     def expire_cache(self):
-        """Expire the dnf cache."""
+        """Expire the dnf cache and refresh the changed metadata."""
         try:
-            self.base.expire_cache()
-            self.base.reset(sack=True, repos=True)
-            #FIXME: Workaround for dnf.Base.reset in hawkey 6.0.3
-            # https://bugzilla.redhat.com/show_bug.cgi?id=1332067
-            self.base.read_all_repos()
-            self.base.repos.all().set_progress_bar(self.base.md_progress)
-            self.base.setup_base()
-            return True
+            status = self._refresh_cache()
+        except dnf.exceptions.RepoError:
+            return False
+        return 'failed' not in status.values()
+
+    def refresh_cache(self):
+        """Refresh the metadata of the enabled repos, if it has changed.
+
+        :return: dict with the status ('updated', 'unchanged' or 'failed')
+                 for each enabled repo in JSON format
+        :raises: dnf.exceptions.RepoError for a failing repo, there can't
+                 be skipped
+        """
+        return json.dumps(self._refresh_cache())
+
+    def _refresh_cache(self):
+        """Refresh the changed metadata and get the status for each repo.
+
+        If the dnf.conf or the .repo files are changed, a new base is
+        loaded with the new config and all enabled repos are refreshed.
+        Without a loaded base, the metadata is checked before the sack is
+        loaded, so it is only loaded once.
+        """
+        self._wait_warmup()
+        try:
+            if self._base and self._base.repo_config_changed():
+                status = self._reload_base()
+            elif self._base:
+                status = self._base.refresh_repos()
+            else:
+                status = self._get_base(load_sack=False).refresh_repos()
+                self._update_base_size()
+                if self._worker:
+                    self._worker.submit(self._build_search_index)
         except dnf.exceptions.RepoError as e:
             self.logger.error(str(e))
             self.ErrorMessage(str(e))
-            return False
+            self._reset_base()  # the sack might not be loaded
+            raise
+        if 'updated' in status.values():  # the sack is loaded again
+            self._cursors.clear()
+            self._cancel_streams()
+            self._close_pool()
+            self._clear_parked()
+        for repo_id, value in sorted(status.items()):
+            if value == 'failed':
+                self.ErrorMessage('Cannot refresh metadata for %s' % repo_id)
+        return status
+
+    def _reload_base(self):
+        """Load a new base with the expired metadata of the enabled repos.
+
+        :return: dict with 'updated' for the loaded repos and 'failed' for
+                 the skipped ones
+        """
+        self.logger.debug('repo config changed, reset base')
+        self._reset_base()
+        base = self._get_base(load_sack=False)
+        repo_ids = [repo.id for repo in base.repos.iter_enabled()]
+        base.expire_cache()
+        base.setup_base()
+        self._update_base_size()
+        loaded = set(repo.id for repo in base.repos.iter_enabled())
+        return dict((repo_id, 'updated' if repo_id in loaded else 'failed')
+                    for repo_id in repo_ids)
 
     def get_groups(self):
         """Get available comps categories & groups"""
@@ -308,11 +727,34 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
         return value
 
     def set_enabled_repos(self, repo_ids):
-        """Enable a list of repos, disable the ones not in list"""
+        """Enable a list of repos, disable the ones not in list
+
+        An empty list enables the repos enabled in the config, like for
+        a new base. With the base cache (--base-cache), the current base
+        is parked, so switching back is instant, and the base for repo_ids
+        is used from the cache or loaded. Without it, the repos are changed
+        in the loaded sack.
+        """
+        self._wait_warmup()
+        park = True
+        if not self._park_budget and self._base and self._base.packages:
+            # change the repos in the loaded sack
+            self._cursors.clear()
+            self._cancel_streams()
+            self._close_pool()
+            try:
+                self._base.set_enabled_repos(repo_ids)
+                self._enabled_repos = repo_ids
+                self._base_key = self._get_base_key()
+                self._update_base_size()  # repos might be added
+                return
+            except Exception as e:
+                self.logger.debug('cannot change the repos in the sack, '
+                                  'reset base : %s', str(e))
+                park = False  # the base is partly changed
+        self._reset_base(park=park)
         self._enabled_repos = repo_ids
-        self._reset_base()
-        self._get_base(reset=True, load_sack=False)
-        self._base.setup_base()  # load the sack with the current enabled repos
+        self._get_base()  # use a parked base or load the sack
 
     def get_packages(self, pkg_filter, attrs):
         """Get packages and attribute values based on a filter.
@@ -320,13 +762,88 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
         :param pkg_filter: pkg pkg_filter string ('installed','updates' etc)
         :param attrs: list of attributes to get.
         """
-        value = []
-        if pkg_filter in ['installed', 'available', 'updates', 'obsoletes',
-                          'recent', 'extras', 'updates_all']:
-            pkgs = getattr(self.base.packages, pkg_filter)
-            value = [self._get_po_list(po, attrs) for po in pkgs]
+        pkgs = self._get_packages(pkg_filter)
+        value = [self._get_po_list(po, attrs) for po in pkgs]
         return json.dumps(value)
 
+    def get_packages_native(self, pkg_filter, attrs):
+        """Get packages and attribute values based on a filter.
+
+        :param pkg_filter: pkg pkg_filter string ('installed','updates' etc)
+        :param attrs: list of attributes to get.
+        :return: D-Bus array of (pkg_id, {attr: value})
+        """
+        pkgs = self._get_packages(pkg_filter)
+        return self._get_native_list(pkgs, attrs)
+
+    def get_packages_chunked(self, pkg_filter, attrs):
+        """Get packages and attribute values based on a filter in chunks.
+
+        The rows are send in PackageChunk signals, from the GLib main loop
+        when idle, a JSON null chunk marks the end of the result.
+
+        :param pkg_filter: pkg pkg_filter string ('installed','updates' etc)
+        :param attrs: list of attributes to get.
+        :return: handle used in the PackageChunk signals
+        """
+        pkgs = self._get_packages(pkg_filter)
+        return self._start_stream(pkgs, attrs)
+
+    def get_packages_paged(self, pkg_filter, attrs, sort_key, offset, limit,
+                           sender=None):
+        """Get the first page of packages and attribute values based on
+        a filter.
+
+        The filtered (and sorted) packages are kept on the server, so the
+        next pages can be read with get_packages_page using the returned
+        cursor, until the cursor expires or the sack is changed.
+        Only the MAX_CURSORS last used cursors are kept for each sender.
+
+        :param pkg_filter: pkg pkg_filter string ('installed','updates' etc)
+        :param attrs: list of attributes to get.
+        :param sort_key: package attribute (in SORT_KEYS) to sort by,
+                         '' = no sorting
+        :param offset: index of first package in the page
+        :param limit: max. number of packages in the page
+        :param sender: client owning the cursor
+        :return: dict with cursor, total & packages **(JSON)**
+        :raises: ValueError for a sort_key, there can't be sorted by
+        """
+        if sort_key and sort_key not in SORT_KEYS:
+            raise ValueError('Cannot sort by %s, use one of : %s' %
+                             (sort_key, ', '.join(SORT_KEYS)))
+        pkgs = list(self._get_packages(pkg_filter))
+        if sort_key:
+            pkgs.sort(key=functools.partial(self._get_sort_value, sort_key))
+        self._expire_cursors()
+        # the sender's cursors by last use (and age for the same time)
+        owned = sorted((value[3], pos, cursor) for pos, (cursor, value)
+                       in enumerate(list(self._cursors.items()))
+                       if value[4] == sender)
+        extra = max(len(owned) - MAX_CURSORS + 1, 0)
+        for used, pos, cursor in owned[:extra]:
+            self._cursors.pop(cursor, None)  # the least recently used
+        cursor = uuid.uuid4().hex
+        self._cursors[cursor] = (self.base.packages, pkgs, attrs, time.time(),
+                                 sender)
+        if sender:
+            self._watch_sender(sender)
+        return self._get_page(cursor, offset, limit)
+
+    def get_packages_page(self, cursor, offset, limit):
+        """Get a page of packages from a cursor made by get_packages_paged
+
+        :param cursor: cursor from get_packages_paged
+        :param offset: index of first package in the page
+        :param limit: max. number of packages in the page
+        :return: dict with cursor, total & packages **(JSON)**, None if
+                 the cursor is expired
+        """
+        self._expire_cursors()
+        if cursor not in self._cursors:
+            return NONE
+        return self._get_page(cursor, offset, limit)
+
     def get_attribute(self, id, attr):
         """Get package attribute.
 
@@ -336,26 +853,60 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
         """
         po = self._get_po(id)
         if po:
-            if attr in FAKE_ATTR:  # is this a fake attr:
-                value = json.dumps(self._get_fake_attributes(po, attr))
-            elif hasattr(po, attr):
-                value = json.dumps(getattr(po, attr))
-            else:
-                value = json.dumps(None)
+            value = json.dumps(self._get_attr(po, attr))
         else:
             value = json.dumps(None)
         return value
 
+    def get_attributes(self, ids, attrs):
+        """Get a list of attributes for a list of packages in one go.
+
+        :param ids: list of yum package ids
+        :param attrs: list of attribute names (summary, size, description,
+                      changelog etc..)
+        :return: dict with {pkg_id: {attr: value, ...}, ...}, the pkg_id
+                 maps to None if the package is not found **(JSON)**
+        """
+        values = {}
+        for pkg_id in ids:
+            po = self._get_po(pkg_id)
+            if po:
+                values[pkg_id] = dict(
+                    (attr, self._get_attr(po, attr)) for attr in attrs)
+            else:
+                values[pkg_id] = None
+        return json.dumps(values)
+
     def get_packages_by_name_with_attr(self, name, attrs, newest_only):
         """get packages matching a name wildcard with given attributes."""
         pkgs = self._get_po_by_name(name, newest_only)
         values = [self._get_po_list(po, attrs) for po in pkgs]
         return json.dumps(values)
 
+    def get_packages_by_name_native(self, name, attrs, newest_only):
+        """get packages matching a name wildcard with given attributes,
+        as a D-Bus array of (pkg_id, {attr: value})
+        """
+        pkgs = self._get_po_by_name(name, newest_only)
+        return self._get_native_list(pkgs, attrs)
+
     def get_group_pkgs(self, grp_id, grp_flt, attrs):
         """Get packages & attributes for a given group id and
         group package type.
         """
+        pkgs = self._get_group_pkgs(grp_id, grp_flt)
+        value = [self._get_po_list(po, attrs) for po in pkgs]
+        return json.dumps(value)
+
+    def get_group_pkgs_native(self, grp_id, grp_flt, attrs):
+        """Get packages & attributes for a given group id and
+        group package type, as a D-Bus array of (pkg_id, {attr: value})
+        """
+        pkgs = self._get_group_pkgs(grp_id, grp_flt)
+        return self._get_native_list(pkgs, attrs)
+
+    def _get_group_pkgs(self, grp_id, grp_flt):
+        """Get packages for a given group id and group package type."""
         pkgs = []
         self._load_comps()
         grp = self.base.comps.group_by_pattern(grp_id)
@@ -374,8 +925,7 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
             pkgs = self.base.packages.filter_packages(best_pkgs)
         else:
             pass
-        value = [self._get_po_list(po, attrs) for po in pkgs]
-        return json.dumps(value)
+        return pkgs
 
     def group_install(self, cmds):
         """Install groups"""
@@ -540,14 +1090,21 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
         rc = 0
         msgs = []
         to_dnl = self._get_packages_to_download()
+        progress = self.base.progress
         try:
             if to_dnl:
                 data = [self._get_id(po) for po in to_dnl]
                 self.TransactionEvent('pkg-to-download', data)
                 self.TransactionEvent('download', NONE)
-                self.base.download_packages(to_dnl, self.base.progress)
+                # check the signatures, while the rest is downloaded
+                checker = backend.SignatureChecker(self.base,
+                                                   self._sig_workers)
+                failed = functools.partial(self._signature_failed,
+                                           dict(zip(to_dnl, data)))
+                progress.sig_queue = backend.SignatureQueue(checker, failed)
+                self.base.download_packages(to_dnl, progress)
                 self.TransactionEvent('signature-check', NONE)
-                self._check_gpg_signatures(to_dnl)
+                self._check_gpg_signatures(to_dnl, progress.sig_queue)
             self.TransactionEvent('run-transaction', NONE)
             display = TransactionProgress(self)  # RPM Display callback
             self._can_quit = False
@@ -573,8 +1130,13 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
             rc = 2
             msgs = [str(e)]
             #print("DEBUG:", msgs)
+        finally:
+            if progress.sig_queue:
+                progress.sig_queue.close()
+                progress.sig_queue = None
         self._can_quit = True
-        self._reset_base()
+        self._refresh_base()
+        self._send_pending_progress()  # not after the end of the run
         self.TransactionEvent('end-run', NONE)
         result = json.dumps((rc, msgs))
         return result
@@ -678,6 +1240,8 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
         self.logger.debug("Setting Option %s = %s" % (option, value))
         self._config_options[option] = value
         if hasattr(self.base.conf, option):
+            self._close_pool()
+            self._base_key = self._get_base_key()
             setattr(self.base.conf, option, value)
             for repo in self.base.repos.iter_enabled():
                 if hasattr(repo, option):
@@ -692,10 +1256,22 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
 #=========================================================================
 # Helper methods
 #=========================================================================
-    def _check_gpg_signatures(self, pkgs):
-        ''' The the signatures of the downloaded packages '''
-        for po in pkgs:
-            result, errmsg = self.base._sig_check_pkg(po)
+    def _check_gpg_signatures(self, pkgs, sig_queue=None):
+        ''' The the signatures of the downloaded packages
+
+        :param sig_queue: SignatureQueue the packages have been submitted to
+        '''
+        if sig_queue:
+            checker = sig_queue.checker
+            results = sig_queue.results(pkgs)
+        else:
+            checker = backend.SignatureChecker(self.base, self._sig_workers)
+            results = checker.check_all(pkgs)
+        keys_changed = False
+        for po, (result, errmsg) in zip(pkgs, results):
+            if result != 0 and keys_changed:
+                # check again with the imported keys
+                result, errmsg = checker.check(po)
             logger.debug('checking signature for : %s, %s', str(po), result)
             if result == 0:
                 # Verified ok, or verify not req'd
@@ -706,10 +1282,22 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
                                            fullaskcb=self._handle_gpg_import)
                 except dnf.exceptions.Error as e:
                     raise GPGError(str(e))
+                checker.keys_changed()
+                keys_changed = True
             else:
                 raise GPGError(errmsg)
         return 0
 
+    def _signature_failed(self, pkg_ids, po, errmsg):
+        """Report a failed signature check during the download.
+
+        It is called from the signature check thread, so the base is not
+        used and the package id is taken from pkg_ids.
+
+        :param pkg_ids: dict with the package ids of the downloaded packages
+        """
+        self.TransactionEvent('signature-error', [pkg_ids[po], errmsg])
+
     def _handle_gpg_import(self, gpg_info):
         """Callback for handling af user confirmation of gpg key import.
 
@@ -827,10 +1415,8 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
         return rc, output
 
     def _get_obsoletes(self):
-        """Cache a list of obsoletes."""
-        if not self._obsoletes_list:
-            self._obsoletes_list = list(self.base.packages.obsoletes)
-        return self._obsoletes_list
+        """Get the set of obsoletes, cached for the current sack."""
+        return self.base.packages.obsoletes_set
 
     def _get_update_info(self, po):
         """Get update info for a package."""
@@ -859,21 +1445,98 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
             value = None
         return value
 
+    def _get_packages(self, pkg_filter):
+        """Get packages based on a filter, [] if the filter is unknown."""
+        if pkg_filter in PKG_FILTERS:
+            return getattr(self.base.packages, pkg_filter)
+        return []
+
+    def _get_native_list(self, pkgs, attrs):
+        """Get a D-Bus array of (pkg_id, {attr: value}) for packages."""
+        values = []
+        for po in pkgs:
+            po_attrs = {}
+            for attr in attrs:
+                po_attrs[attr] = _to_dbus(self._get_attr(po, attr))
+            values.append(dbus.Struct(
+                (self._get_id(po), dbus.Dictionary(po_attrs, signature='sv'))))
+        return dbus.Array(values, signature='(sa{sv})')
+
     def _get_po_list(self, po, attrs):
         """Get a list packages with given attributes."""
         if not attrs:
             return self._get_id(po)
         po_list = [self._get_id(po)]
         for attr in attrs:
-            if attr in FAKE_ATTR:  # is this a fake attr:
-                value = self._get_fake_attributes(po, attr)
-            elif hasattr(po, attr):
-                value = getattr(po, attr)
-            else:
-                value = None
-            po_list.append(value)
+            po_list.append(self._get_attr(po, attr))
         return po_list
 
+    def _start_stream(self, pkgs, attrs):
+        """Start sending the rows for pkgs in PackageChunk signals."""
+        handle = uuid.uuid4().hex
+        rows = (self._get_po_list(po, attrs) for po in pkgs)
+        self._streams[handle] = rows
+        self._run_idle(self._send_chunk, handle)
+        return handle
+
+    def _send_chunk(self, handle):
+        """Send the next chunk of a stream, called by _run_idle."""
+        rows = self._streams.get(handle)
+        if rows is None:  # the stream is cancelled
+            return False
+        chunk = list(itertools.islice(rows, CHUNK_SIZE))
+        if chunk:
+            self.PackageChunk(handle, json.dumps(chunk))
+            return True
+        del self._streams[handle]
+        self.PackageChunk(handle, NONE)
+        return False
+
+    def _cancel_streams(self):
+        """End the active streams, without sending the rest of the rows."""
+        for handle in list(self._streams):
+            del self._streams[handle]
+            self.PackageChunk(handle, NONE)
+
+    def _get_page(self, cursor, offset, limit):
+        """Get a page of packages from a cursor as JSON."""
+        packages, pkgs, attrs, _, sender = self._cursors[cursor]
+        self._cursors[cursor] = (packages, pkgs, attrs, time.time(), sender)
+        offset = max(offset, 0)
+        page = [self._get_po_list(po, attrs)
+                for po in pkgs[offset:offset + max(limit, 0)]]
+        value = {'cursor': cursor, 'total': len(pkgs), 'packages': page}
+        return json.dumps(value)
+
+    def _expire_cursors(self):
+        """Remove the expired cursors and the ones made on an old sack."""
+        packages = self._base.packages if self._base else None
+        expire = time.time() - CURSOR_TIMEOUT
+        for cursor, (pkgs_obj, _, _, used, _) in list(self._cursors.items()):
+            if pkgs_obj is not packages or used < expire:
+                self._cursors.pop(cursor, None)
+
+    def _drop_cursors(self, sender):
+        """Remove the cursors of a sender."""
+        for cursor, value in list(self._cursors.items()):
+            if value[4] == sender:
+                self._cursors.pop(cursor, None)
+
+    @staticmethod
+    def _get_sort_value(sort_key, po):
+        """Get a value to sort a package by, None is sorted last."""
+        value = getattr(po, sort_key, None)
+        return (value is None, value)
+
+    def _get_attr(self, po, attr):
+        """Get the value of a real or fake attribute from a package."""
+        if attr in FAKE_ATTR:  # is this a fake attr:
+            return self._get_fake_attributes(po, attr)
+        elif hasattr(po, attr):
+            return getattr(po, attr)
+        else:
+            return None
+
     def _get_id_time_list(self, hist_trans):
         """Get a list of (tid, isodate) pairs from a list of
         history transactions.
@@ -965,39 +1628,17 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
     def _get_po(self, id):
         """Get the package from given package id."""
         n, e, v, r, a, repo_id = id.split(',')
-        q = self.base.sack.query()
-        if repo_id.startswith('@'):  # installed package
-            f = q.installed()
-            f = f.filter(name=n, version=v, release=r, arch=a)
-            if len(f) > 0:
-                return f[0]
-            else:
-                return None
-        else:
-            f = q.available()
-            f = f.filter(name=n, version=v, release=r, arch=a)
-            if len(f) > 0:
-                return f[0]
-            else:
-                return None
+        return self.base.packages.find(n, e, v, r, a, repo_id)
 
     def _get_po_available(self, id):
-        """ """
+        """Get the available package from given package id."""
         n, e, v, r, a, repo_id = id.split(',')
-        q = self.base.sack.query()
-        f = q.available()
-        f = f.filter(name=n, version=v, release=r, arch=a)
-        if len(f) > 0:
-            return f[0]
-        else:
-            return None
+        return self.base.packages.find(n, e, v, r, a, repo_id,
+                                       installed=False)
 
     def _get_id(self, pkg):
         """Get a package id from a given package."""
-        values = [
-            pkg.name, str(pkg.epoch), pkg.version, pkg.release,
-            pkg.arch, pkg.ui_from_repo]
-        return ",".join(values)
+        return self.base.packages.get_id(pkg)
 
     def _get_action(self, po):
         """Get the action for a given package.
@@ -1010,33 +1651,29 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
         :param po: package
         :return: action (remove, install, update, downgrade, obsolete)
         """
-        action = 'install'
-        n, a, e, v, r = po.pkgtup
-        q = self.base.sack.query()
-        if po.reponame.startswith('@'):
-            action = 'remove'
-        else:
-            upd = q.upgrades().filter(name=n, version=v, release=r, arch=a)
-            if upd:
-                action = 'update'
-            else:
-                obsoletes = self._get_obsoletes()
-                if po in obsoletes:
-                    action = 'obsolete'
-                else:
-                    # get installed packages with same name
-                    ipkgs = q.installed().filter(name=po.name).run()
-                    if ipkgs:
-                        ipkg = ipkgs[0]
-                        if ipkg.evr_gt(po):  # inst po > po => downgrade
-                            action = 'downgrade'
-        return action
+        return self.base.packages.get_action(po)
 
     def _get_base(self, reset=False, load_sack=True):
         """Get a cached dnf.Base object."""
         if not self._base or reset:
+            key = self._get_base_key()
+            if key in self._parked:
+                logger.debug('using parked DnfBase')
+                self._base, self._base_size = self._parked.pop(key)
+                self._base_rss = _get_rss() - self._base_size
+                self._base_key = key
+                return self._base
             logger.debug('setup DnfBase')
+            self._base_rss = _get_rss()
             self._base = backend.DnfBase(self)
+            self._base.load_workers = self._load_workers
+            # the download progress is throttled like the other progress
+            if self._progress_rate:
+                self._base.progress.interval = 1.0 / self._progress_rate
+            else:
+                self._base.progress.interval = 0
+            self._base.config_options = self._config_options
+            self._base_key = key
             for option in self._config_options:
                 value = self._config_options[option]
                 setattr(self._base.conf, option, value)
@@ -1052,13 +1689,213 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
                         pass
             if load_sack:
                 self._base.setup_base()
+                if self._worker:  # before the first search needs it
+                    self._worker.submit(self._build_search_index)
+            self._update_base_size()
         return self._base
 
-    def _reset_base(self):
-        """Close the current dnf.Base object."""
+    def _update_base_size(self):
+        """Estimate the memory used by the base, after the sack is loaded.
+
+        The size is the growth of the daemon memory since the base was
+        created, so it must be updated, when the sack is loaded later.
+        """
+        self._base_size = max(_get_rss() - self._base_rss, 0)
+
+    def _build_search_index(self):
+        """Load or build the search index for the loaded sack."""
+        packages = self._base._packages if self._base else None
+        if packages:
+            try:
+                packages.search_index
+            except Exception as e:  # the search will build it again
+                self.logger.warning('Building search index failed : %s', e)
+
+    def _get_base_key(self, repo_ids=None):
+        """Get the key for the parked bases: enabled repos & config options.
+        """
+        if repo_ids is None:
+            repo_ids = self._enabled_repos
+        return (frozenset(repo_ids),
+                json.dumps(self._config_options, sort_keys=True))
+
+    def _setup_load_workers(self, size):
+        """Setup the number of processes loading the repos (0 = off)."""
+        self._load_workers = size
+
+    def _setup_sig_workers(self, size):
+        """Setup the number of processes checking signatures (0 = off)."""
+        self._sig_workers = size
+
+    def _setup_progress_rate(self, rate):
+        """Setup the max. progress signals per sec. (0 = send all)."""
+        self._progress_rate = rate
+
+    def _send_progress(self, key, signal, *args, now=False):
+        """Send a progress signal, coalesced by key.
+
+        The pending signals are flushed from the main loop progress_rate
+        times a second, and only the last signal for each key is send.
+        When now is True, the signal is send at once, after the other
+        pending signals, and replaces the pending signal for the key.
+
+        :param key: key of the progress, like ('rpm', pkg_id)
+        :param signal: name of the signal method
+        """
+        if not self._progress_rate:
+            getattr(self, signal)(*args)
+            return
+        with self._progress_lock:
+            if not now:
+                self._pending_progress[key] = (signal, args)
+                if not self._progress_timer:
+                    self._progress_timer = GLib.timeout_add(
+                        int(1000 / self._progress_rate),
+                        self._flush_progress)
+                return
+            self._pending_progress.pop(key, None)
+            # no older progress is send after a start or end
+            self._send_pending_progress()
+            getattr(self, signal)(*args)
+
+    def _send_pending_progress(self):
+        """Send the pending progress signals in the order they came in."""
+        with self._progress_lock:
+            pending = self._pending_progress
+            self._pending_progress = collections.OrderedDict()
+            for signal, args in pending.values():
+                getattr(self, signal)(*args)
+
+    def _flush_progress(self):
+        """Send the pending progress signals, called from the main loop."""
+        with self._progress_lock:
+            self._progress_timer = None
+            self._send_pending_progress()
+        return False
+
+    def _setup_base_cache(self, size):
+        """Setup the memory budget for the parked bases in MB (0 = off)."""
+        self._park_budget = size * 1024 * 1024
+
+    def _park_base(self, base):
+        """Keep a base in the LRU cache of parked bases, instead of closing it.
+
+        A base for the same repos & config is used again by _get_base. The
+        least recently parked bases are closed, when the estimated memory of
+        the parked bases is over the budget.
+        """
+        base.reset(goal=True)
+        old = self._parked.pop(self._base_key, None)
+        if old:
+            old[0].close()
+        self._parked[self._base_key] = (base, self._base_size)
+        while sum(size for _, size in self._parked.values()) > \
+                self._park_budget:
+            _, (old_base, _) = self._parked.popitem(last=False)
+            old_base.close()
+
+    def _clear_parked(self):
+        """Close the parked bases, when the system or the metadata changed."""
+        while self._parked:
+            _, (base, _) = self._parked.popitem()
+            base.close()
+
+    def _reset_base(self, park=False):
+        """Close the current dnf.Base object.
+
+        :param park: park the base for later use (if enabled), else the
+                     parked bases are closed too
+        """
+        self._wait_warmup()
+        self._cursors.clear()
+        self._cancel_streams()
+        self._close_pool()
         if self._base:
-            self._base.close()
+            if park and self._park_budget:
+                self._park_base(self._base)
+            else:
+                self._base.close()
             self._base = None
+        if not park:
+            self._clear_parked()
+
+    def _refresh_base(self):
+        """Refresh the installed packages after a transaction.
+
+        The dnf.Base object is kept, if the refresh fails (dnf, hawkey or
+        OS errors loading the sack) it is closed.
+        """
+        self._cursors.clear()
+        self._cancel_streams()
+        self._close_pool()
+        self._clear_parked()  # the installed packages has changed
+        if self._base:
+            try:
+                self._base.refresh_installed()
+            except Exception as e:
+                self.logger.warning('refresh failed, reset base : %s',
+                                    str(e))
+                self._reset_base()
+
+    def _is_authorized(self, authorized, sender):
+        """Check for a cached and not expired authorization of sender.
+
+        :param authorized: authorized_sender_read or authorized_sender_write
+        """
+        expires = authorized.get(sender)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del authorized[sender]
+            return False
+        return True
+
+    def _set_authorized(self, authorized, sender):
+        """Cache the authorization of sender for _auth_ttl secs."""
+        authorized[sender] = time.monotonic() + self._auth_ttl
+        self._watch_sender(sender)
+
+    def _setup_name_watch(self, bus):
+        """Forget the clients, when they disconnect from the bus."""
+        self._name_bus = bus
+
+    def _watch_sender(self, sender):
+        """Watch for the disconnect of a client, the daemon keeps state for.
+
+        Only the NameOwnerChanged signals for the watched clients are
+        received (arg0 match), not the ones for every name on the bus.
+        The watch is added from the main loop.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            GLib.idle_add(self._watch_sender, sender)
+            return False
+        if self._name_bus and sender not in self._name_watches:
+            self._name_watches[sender] = self._name_bus.watch_name_owner(
+                sender, functools.partial(self._name_owner_changed, sender))
+        return False
+
+    def _name_owner_changed(self, name, new_owner):
+        """Handle the owner change of a watched client.
+
+        When a client disconnects, its cached authorizations and cursors
+        are removed and the lock is released, if it was holding it.
+        """
+        if new_owner:  # not a disconnect
+            return
+        match = self._name_watches.pop(name, None)
+        if match:
+            match.remove()
+        self.authorized_sender_read.pop(name, None)
+        self.authorized_sender_write.pop(name, None)
+        self._drop_cursors(name)
+        if self._lock == name:
+            self.logger.info('UNLOCK: %s disconnected' % name)
+            self._lock = None
+            # park the base for the next client (--base-cache)
+            self.run_in_worker(
+                lambda: None,
+                lambda e: self.logger.warning('Reset base failed : %s', e),
+                self._reset_base, True)
 
     def _setup_watchdog(self):
         """Setup the DBUS service watchdog to run every second when idle."""
@@ -1067,8 +1904,10 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
     def _watchdog(self):
         """Handle the DBUS service watchdog calls."""
         terminate = False
-        if self._watchdog_disabled or self._is_working:  # is working
+        if (self._watchdog_disabled or self._is_working or self._jobs or
+                self._streams or self._warmup):  # is working
             return True
+        self._expire_cursors()
         if not self._lock:  # is locked
             if self._watchdog_count > self._timeout_idle:
                 terminate = True
@@ -1098,6 +1937,20 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
         #print("event: %s" % event)
         pass
 
+    def BaseReady(self, ok):
+        """BaseReady stub, overload in child class
+
+        Needed for unit testing
+        """
+        pass
+
+    def PackageChunk(self, handle, chunk):
+        """PackageChunk stub, overload in child class
+
+        Needed for unit testing
+        """
+        pass
+
     def ErrorMessage(self, msg):
         """ErrorMessage stub, overload in child class
 
@@ -1107,6 +1960,31 @@ class DnfDaemonBase(dbus.service.Object, DownloadCallback):
         pass
 
 
+class _PoolDaemon(DnfDaemonBase):
+    """The daemon serving the queries in a query pool process."""
+
+    def _get_base(self, reset=False, load_sack=True):
+        """Get the base, with the sack loaded from the metadata cache.
+
+        The metadata is loaded by the daemon first, so it is not checked
+        or downloaded again by the processes, and only the search indexes
+        saved by the daemon are used.
+        """
+        if self._base and not reset:
+            return self._base
+        base = DnfDaemonBase._get_base(self, reset, load_sack=False)
+        base.build_search_index = False
+        for repo in base.repos.iter_enabled():
+            repo.md_only_cached = True  # don't expire or download it
+        if load_sack:
+            base.setup_base()
+        return base
+
+    def repoMetaDataProgress(self, name, frac):
+        """The metadata progress is not send from the pool processes."""
+        pass
+
+
 def doTextLoggerSetup(logroot='dnfdaemon', logfmt='%(asctime)s: %(message)s',
                       loglvl=logging.INFO):
     """Setup Python logging."""
@@ -21,6 +21,7 @@ dnf base and callbacks for dnfdaemon dbus services
 from time import time
 from dnf.i18n import _, ucd
 from dnf.yum import misc
+from . import searchindex
 
 import dnf
 import dnf.const
@@ -28,13 +29,19 @@ import dnf.conf
 import dnf.exceptions
 import dnf.callback
 import dnf.comps
+import dnf.goal
 import dnf.rpm
+import dnf.sack
 import dnf.subject
 import dnf.transaction
 import dnf.yum
 import hawkey
+import concurrent.futures
+import glob
 import itertools
 import logging
+import multiprocessing
+import queue
 import sys
 import os
 
@@ -42,6 +49,64 @@ logger = logging.getLogger('dnfdaemon.base.dnf')
 
 UPDINFO_MAIN = ['id', 'title', 'type', 'description', 'filenames']
 
+# the base of a repo loading process
+_load_base = None
+# the read-only transaction set of a signature checking process
+_sig_ts = None
+
+
+class _QueuedProgress:
+    """Send the metadata progress from a repo loading process to the daemon.
+    """
+
+    def __init__(self, progress_queue):
+        self._queue = progress_queue
+
+    def repoMetaDataProgress(self, name, frac):
+        self._queue.put((name, frac))
+
+
+def _init_load_repo(config_options, progress_queue):
+    """Setup the base of a repo loading process.
+
+    The processes are started by a fork server, so they don't inherit the
+    threads & the bus connection of the daemon. The base reads the dnf.conf
+    & the .repo files and the config options of the daemon are set.
+    """
+    global _load_base
+    _load_base = DnfBase(_QueuedProgress(progress_queue))
+    for option, value in config_options.items():
+        setattr(_load_base.conf, option, value)
+
+
+def _load_repo(repo_id):
+    """Download the metadata and build the solv cache for a repo.
+
+    Run in a repo loading process.
+
+    :return: error message or None
+    """
+    base = _load_base
+    try:
+        # FIXME: dnf.sack._build_sack & _add_repo_to_sack is not public API
+        base._sack = dnf.sack._build_sack(base)
+        base._add_repo_to_sack(base.repos[repo_id])
+    except dnf.exceptions.RepoError as e:
+        return str(e)
+    return None
+
+
+def _init_sig_check(root):
+    """Setup a signature checking process."""
+    global _sig_ts
+    _sig_ts = dnf.rpm.transaction.initReadOnlyTransaction(root)
+
+
+def _check_sig(path):
+    """Check the signature of a package file in a signature checking process.
+    """
+    return dnf.rpm.miscutils.checkSig(_sig_ts, path)
+
 
 class DnfBase(dnf.Base):
     """An extended version of the dnf.Base class."""
@@ -54,22 +119,192 @@ class DnfBase(dnf.Base):
         self.conf.substitutions['releasever'] = RELEASEVER
         self.conf.read()  # read the dnf.conf
         self.read_all_repos()
+        self._repo_config = self._get_repo_config()
+        # ids of the repos enabled in the config
+        self._default_repos = set(r.id for r in self.repos.iter_enabled())
         self.progress = Progress(parent)
         self.repos.all().set_progress_bar(self.md_progress)
         self._packages = None
+        self._loaded_repos = set()  # ids of the repos loaded in the sack
+        self.load_workers = 0  # processes loading the repos (0 = no processes)
+        self.config_options = {}  # config options set by the daemon
+        self.build_search_index = True  # else only saved indexes are used
+
+    def add_remote_rpm(self, path):
+        """Add a local rpm to the sack and drop the cached package lookups"""
+        po = super(DnfBase, self).add_remote_rpm(path)
+        if self._packages:
+            self._packages.reset()
+        return po
+
+    def _get_repo_config(self):
+        """Get the mtime & size of the dnf.conf and the .repo files"""
+        paths = [self.conf.config_file_path]
+        for reposdir in self.conf.reposdir:
+            paths.extend(glob.glob(os.path.join(reposdir, '*.repo')))
+        config = {}
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            config[path] = (st.st_mtime, st.st_size)
+        return config
+
+    def repo_config_changed(self):
+        """Check if the dnf.conf or the .repo files are changed"""
+        return self._get_repo_config() != self._repo_config
 
     def expire_cache(self):
         """Make the current cache expire"""
         for repo in self.repos.iter_enabled():
             repo._md_expire_cache()
 
+    def refresh_repos(self):
+        """Refresh the metadata of the enabled repos, if it has changed
+
+        dnf only downloads the repomd.xml for expired metadata and keeps
+        the cached metadata, if the repomd.xml is unchanged. The metadata
+        progress is held back, while a repo is loaded, and only send for
+        the repos with changed metadata. The sack is only loaded again, if
+        the metadata of a repo has changed or it is not loaded yet.
+
+        :return: dict with repo_id : 'updated', 'unchanged' or 'failed'
+        :raises: dnf.exceptions.RepoError for a failing repo, there can't
+                 be skipped
+        """
+        status = {}
+        for repo in self.repos.iter_enabled():
+            checksum = searchindex.repo_checksum(repo)
+            repo._md_expire_cache()
+            self.md_progress.hold()
+            try:
+                downloaded = repo.load()
+            except dnf.exceptions.RepoError as e:
+                self.md_progress.release(False)
+                if repo.skip_if_unavailable is False:
+                    raise
+                logger.warning('%s : %s', repo.id, str(e))
+                status[repo.id] = 'failed'
+                continue
+            if downloaded and searchindex.repo_checksum(repo) != checksum:
+                status[repo.id] = 'updated'
+            else:
+                status[repo.id] = 'unchanged'
+            self.md_progress.release(status[repo.id] == 'updated')
+        if 'updated' in status.values() or self._packages is None:
+            self.reset(sack=True)
+            self.setup_base()
+        return status
+
+    def reset(self, sack=False, repos=False, goal=False):
+        """Reset the base and drop the package caches depending on it"""
+        super(DnfBase, self).reset(sack=sack, repos=repos, goal=goal)
+        if sack:
+            self._packages = None
+        elif goal and self._packages:
+            self._packages.reset_actions()
+
     def setup_base(self):
         """Setup dnf Sack and init packages helper"""
         logger.debug('setup DnfBase sack')
+        if self.load_workers:
+            try:
+                self._load_repos()
+            except Exception as e:  # fill_sack will load the repos
+                logger.warning('Loading repos in parallel failed : %s', e)
         self.fill_sack()
+        self._loaded_repos = set(r.id for r in self.repos.iter_enabled())
         logger.debug('setup packages')
         self._packages = Packages(self)
 
+    def _load_repos(self):
+        """Load the enabled repos in parallel.
+
+        The metadata download, checksum check and solv cache build for each
+        repo is done in a pool of processes, so fill_sack only has to load
+        the repos from the solv cache. The metadata progress from the
+        processes is send from this process.
+        """
+        repo_ids = [repo.id for repo in self.repos.iter_enabled()]
+        if len(repo_ids) < 2:
+            return
+        context = multiprocessing.get_context('forkserver')
+        progress_queue = context.Queue()
+        pool = context.Pool(min(self.load_workers, len(repo_ids)),
+                            _init_load_repo,
+                            (dict(self.config_options), progress_queue))
+        try:
+            result = pool.map_async(_load_repo, repo_ids)
+            while not result.ready():
+                try:
+                    name, frac = progress_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                self.md_progress.parent.repoMetaDataProgress(name, frac)
+            errors = result.get()
+            pool.close()
+            pool.join()  # the progress is flushed, when the processes end
+            while not progress_queue.empty():
+                name, frac = progress_queue.get()
+                self.md_progress.parent.repoMetaDataProgress(name, frac)
+        finally:
+            pool.terminate()
+        for repo_id, error in zip(repo_ids, errors):
+            if error:  # fill_sack will handle it
+                logger.debug('Loading %s failed : %s', repo_id, error)
+
+    def refresh_installed(self):
+        """Reload the sack after a transaction changed the installed packages
+
+        The config and the repos are kept, so the available repos are
+        loaded from the solv cache without checking the metadata again,
+        and the package caches are rebuild in place.
+        """
+        logger.debug('refresh DnfBase sack')
+        super(DnfBase, self).reset(sack=True, goal=True)
+        self.fill_sack()
+        self._loaded_repos = set(r.id for r in self.repos.iter_enabled())
+        if self._packages:
+            self._packages.refresh()
+        else:
+            self._packages = Packages(self)
+
+    def set_enabled_repos(self, repo_ids):
+        """Enable a list of repos in the loaded sack, disable the others
+
+        Repos not loaded yet are added to the sack, the packages of the
+        disabled repos are kept in the sack, but left out of the queries.
+        An empty list enables the repos enabled in the config.
+        """
+        if not repo_ids:
+            repo_ids = self._default_repos
+        for repo in self.repos.all():
+            if repo.id not in repo_ids:
+                repo.disable()
+                if repo.id in self._loaded_repos:
+                    self.sack.disable_repo(repo.id)
+                continue
+            repo.enable()
+            if repo.id in self._loaded_repos:
+                self.sack.enable_repo(repo.id)
+                continue
+            logger.debug('adding %s to the sack', repo.id)
+            try:
+                # FIXME: _add_repo_to_sack is not public API
+                self._add_repo_to_sack(repo)
+            except dnf.exceptions.RepoError as e:
+                if repo.skip_if_unavailable is False:
+                    raise
+                logger.warning('%s, disabling.', e)
+                repo.disable()
+                continue
+            self._loaded_repos.add(repo.id)
+            # FIXME: _setup_excludes_includes is not public API
+            self._setup_excludes_includes()
+        super(DnfBase, self).reset(goal=True)
+        self._packages.refresh()
+
     @property
     def packages(self):
         return self._packages
@@ -83,23 +318,31 @@ class DnfBase(dnf.Base):
         :param showdups: show duplicate packages or latest (default)
         :return: a list of package objects
         """
-        matches = set()
+        query = None
         for key in values:
-            key_set = set()
-            for attr in fields:
-                pkgs = set(self.contains(attr, key).run())
-                key_set |= pkgs
-            if len(matches) == 0:
-                matches = key_set
+            key_query = self._search_fields(fields, key)
+            if query is None:
+                query = key_query
+            elif match_all:
+                query = query.intersection(key_query)
             else:
-                if match_all:
-                    matches &= key_set
-                else:
-                    matches |= key_set
-        result = list(matches)
+                query = query.union(key_query)
+        if query is None:
+            return []
         if not showdups:
-            result = self.sack.query().filter(pkg=result).latest().run()
-        return result
+            query = query.latest()
+        return query.run()
+
+    def _search_fields(self, fields, key):
+        """Get a query for packages where one of the fields contains key."""
+        index = self._packages.search_index if self._packages else None
+        query = self.sack.query().filter(empty=True)
+        for attr in fields:
+            attr_query = index.query(attr, key) if index else None
+            if attr_query is None:  # not indexed, do a full search
+                attr_query = self.contains(attr, key)
+            query = query.union(attr_query)
+        return query
 
     def contains(self, attr, needle, ignore_case=True):
         fdict = {'%s__substr' % attr: needle}
@@ -126,52 +369,7 @@ class DnfBase(dnf.Base):
                     might help.
               2 = Fatal GPG verification error, give up.
         """
-        if po._from_cmdline:
-            check = self.conf.localpkg_gpgcheck
-            hasgpgkey = 0
-        else:
-            repo = self.repos[po.repoid]
-            check = repo.gpgcheck
-            hasgpgkey = not not repo.gpgkey
-
-        if check:
-            root = self.conf.installroot
-            ts = dnf.rpm.transaction.initReadOnlyTransaction(root)
-            sigresult = dnf.rpm.miscutils.checkSig(ts, po.localPkg())
-            localfn = os.path.basename(po.localPkg())
-            del ts
-            if sigresult == 0:
-                result = 0
-                msg = ''
-
-            elif sigresult == 1:
-                if hasgpgkey:
-                    result = 1
-                else:
-                    result = 2
-                msg = _('Public key for %s is not installed') % localfn
-
-            elif sigresult == 2:
-                result = 2
-                msg = _('Problem opening package %s') % localfn
-
-            elif sigresult == 3:
-                if hasgpgkey:
-                    result = 1
-                else:
-                    result = 2
-                result = 1
-                msg = _('Public key for %s is not trusted') % localfn
-
-            elif sigresult == 4:
-                result = 2
-                msg = _('Package %s is not signed') % localfn
-
-        else:
-            result = 0
-            msg = ''
-
-        return result, msg
+        return SignatureChecker(self).check(po)
 
     def _get_key_for_package(self, po, askcb=None, fullaskcb=None):
         """Retrieve a key for a package. If needed, use the given
@@ -264,6 +462,188 @@ class DnfBase(dnf.Base):
             raise dnf.exceptions.Error(_prov_key_data(errmsg))
 
 
+class SignatureChecker:
+    """Verify the GPG signatures of a batch of downloaded packages.
+
+    One read-only rpm transaction set is used for all the packages, and
+    the gpgcheck & gpgkey settings are only looked up once for each repo.
+    The check itself is copied from dnf (Base._sig_check_pkg).
+    """
+
+    def __init__(self, base, workers=0):
+        self._base = base
+        self._ts = None
+        self._repo_conf = {}  # repo id -> (gpgcheck, has gpgkey)
+        self.workers = workers  # processes for check_all (0 = no processes)
+
+    def keys_changed(self):
+        """Use a new transaction set, after GPG keys has been imported.
+
+        The transaction set reads the keys from the rpmdb on first use.
+        """
+        self._ts = None
+
+    def _get_ts(self):
+        if self._ts is None:
+            root = self._base.conf.installroot
+            self._ts = dnf.rpm.transaction.initReadOnlyTransaction(root)
+        return self._ts
+
+    def _get_repo_conf(self, repoid):
+        if repoid not in self._repo_conf:
+            repo = self._base.repos[repoid]
+            self._repo_conf[repoid] = (repo.gpgcheck, not not repo.gpgkey)
+        return self._repo_conf[repoid]
+
+    def _get_check(self, po):
+        """Get (gpgcheck, has gpgkey) for a package."""
+        if po._from_cmdline:
+            return self._base.conf.localpkg_gpgcheck, 0
+        else:
+            return self._get_repo_conf(po.repoid)
+
+    def check(self, po):
+        """Verify the GPG signature of the given package object.
+
+        :param po: the package object to verify the signature of
+        :return: (result, error_string), see DnfBase._sig_check_pkg
+        """
+        check, hasgpgkey = self._get_check(po)
+        if check:
+            sigresult = dnf.rpm.miscutils.checkSig(self._get_ts(),
+                                                   po.localPkg())
+            return self._get_result(po, sigresult, hasgpgkey)
+        return 0, ''
+
+    def check_all(self, pkgs):
+        """Verify the GPG signatures of the given package objects.
+
+        With workers, the signatures are checked in parallel by a pool
+        of processes, started by a fork server, so they don't inherit the
+        threads & the bus connection of the daemon.
+
+        :return: list of (result, error_string) for each package
+        """
+        checks = [self._get_check(po) for po in pkgs]
+        to_check = [po.localPkg()
+                    for po, (check, hasgpgkey) in zip(pkgs, checks) if check]
+        if self.workers and len(to_check) > 1:
+            context = multiprocessing.get_context('forkserver')
+            root = self._base.conf.installroot
+            pool = context.Pool(min(self.workers, len(to_check)),
+                                _init_sig_check, (root,))
+            try:
+                sigresults = iter(pool.map(_check_sig, to_check))
+                pool.close()
+                pool.join()
+            finally:
+                pool.terminate()
+            return [self._get_result(po, next(sigresults), hasgpgkey)
+                    if check else (0, '')
+                    for po, (check, hasgpgkey) in zip(pkgs, checks)]
+        return [self.check(po) for po in pkgs]
+
+    def _get_result(self, po, sigresult, hasgpgkey):
+        """Get (result, error_string) for a rpm checkSig result."""
+        localfn = os.path.basename(po.localPkg())
+        if sigresult == 0:
+            result = 0
+            msg = ''
+
+        elif sigresult == 1:
+            if hasgpgkey:
+                result = 1
+            else:
+                result = 2
+            msg = _('Public key for %s is not installed') % localfn
+
+        elif sigresult == 2:
+            result = 2
+            msg = _('Problem opening package %s') % localfn
+
+        elif sigresult == 3:
+            if hasgpgkey:
+                result = 1
+            else:
+                result = 2
+            result = 1
+            msg = _('Public key for %s is not trusted') % localfn
+
+        elif sigresult == 4:
+            result = 2
+            msg = _('Package %s is not signed') % localfn
+
+        return result, msg
+
+
+class SignatureQueue:
+    """Check the package signatures, while the packages are downloaded.
+
+    The packages are submitted by Progress, when their download is done,
+    and checked in a thread, or by the signature checking processes,
+    when the checker has workers. The download continues meanwhile.
+    """
+
+    def __init__(self, checker, failed=None):
+        """
+        :param checker: SignatureChecker to use
+        :param failed: callback(po, error_string) for fatal check errors
+        """
+        self.checker = checker
+        self._failed = failed
+        self._pending = {}  # po -> future for the check result
+        self._pool = None
+        if checker.workers:  # not inheriting the threads of the daemon
+            context = multiprocessing.get_context('forkserver')
+            root = checker._base.conf.installroot
+            self._pool = context.Pool(checker.workers, _init_sig_check,
+                                      (root,))
+        # the checker transaction set is only used by one thread
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max(checker.workers, 1))
+
+    def submit(self, po):
+        """Start checking the signature of a downloaded package."""
+        check, hasgpgkey = self.checker._get_check(po)
+        future = self._executor.submit(self._check, po, check, hasgpgkey)
+        self._pending[po] = future
+
+    def _check(self, po, check, hasgpgkey):
+        if not check:
+            return 0, ''
+        if self._pool:
+            sigresult = self._pool.apply(_check_sig, (po.localPkg(),))
+            result = self.checker._get_result(po, sigresult, hasgpgkey)
+        else:
+            result = self.checker.check(po)
+        if result[0] == 2 and self._failed:
+            self._failed(po, result[1])
+        return result
+
+    def results(self, pkgs):
+        """Get the check results for the packages.
+
+        Wait for the submitted checks, the packages not submitted (like
+        packages rebuilt from delta rpms) are checked now.
+
+        :return: list of (result, error_string) for each package
+        """
+        results = [self._pending[po].result() if po in self._pending
+                   else None for po in pkgs]
+        self.close()
+        rest = [po for po, result in zip(pkgs, results) if result is None]
+        rest_results = iter(self.checker.check_all(rest))
+        return [next(rest_results) if result is None else result
+                for result in results]
+
+    def close(self):
+        """Stop the check thread and processes."""
+        self._executor.shutdown()
+        if self._pool:
+            self._pool.terminate()
+            self._pool = None
+
+
 class Packages:
     """This class gives easier access to getting packages from the dnf Sack."""
 
@@ -271,6 +651,133 @@ class Packages:
         self._base = base
         self._sack = base.sack
         self._inst_na = self._sack.query().installed()._na_dict()
+        self._nevra_index = None  # Cache for find(), build on first use
+        self._pkg_ids = {}  # Cache for get_id()
+        self._action_table = None  # Cache for get_action(), build on use
+        self._actions = {}
+        self._obsoletes_set = None  # Cache for obsoletes_set
+        self._search_index = None  # Cache for search_index, build on use
+        self._updates = None  # Cache for updates
+
+    def refresh(self):
+        """Rebuild the caches for a new sack in the base."""
+        self._sack = self._base.sack
+        self._inst_na = self._sack.query().installed()._na_dict()
+        self._search_index = None  # it refers to packages in the old sack
+        self.reset()
+
+    def reset(self):
+        """Drop the cached package lookups, rebuilt on next use."""
+        self._nevra_index = None
+        self._pkg_ids = {}
+        self._obsoletes_set = None
+        self._updates = None
+        self.reset_actions()
+
+    def reset_actions(self):
+        """Drop the cached package actions."""
+        self._action_table = None
+        self._actions = {}
+
+    def get_action(self, po):
+        """Get the action there can be performed on a package.
+
+        :param po: package
+        :return: action (remove, install, update, downgrade, obsolete)
+        """
+        try:
+            return self._actions[po]
+        except KeyError:
+            pass
+        if self._action_table is None:
+            self._action_table = self._build_action_table()
+        upgrades, obsoletes, inst_by_name = self._action_table
+        action = 'install'
+        if po.reponame.startswith('@'):
+            action = 'remove'
+        elif po in upgrades:
+            action = 'update'
+        elif po in obsoletes:
+            action = 'obsolete'
+        else:
+            ipkg = inst_by_name.get(po.name)
+            if ipkg and ipkg.evr_gt(po):  # inst po > po => downgrade
+                action = 'downgrade'
+        self._actions[po] = action
+        return action
+
+    def _build_action_table(self):
+        """Get the (upgrades, obsoletes, installed by name) used by get_action.
+        """
+        upgrades = set(self.query.upgrades().run())
+        inst_by_name = {}
+        for pkg in self.query.installed().run():
+            inst_by_name.setdefault(pkg.name, pkg)
+        return upgrades, self.obsoletes_set, inst_by_name
+
+    def get_id(self, pkg):
+        """Get the package id (name,epoch,ver,rel,arch,repo) for a package.
+
+        The ids are cached per sack, keyed by the package object, which
+        hawkey hashes by its solvable id.
+        """
+        try:
+            return self._pkg_ids[pkg]
+        except KeyError:
+            values = [
+                pkg.name, str(pkg.epoch), pkg.version, pkg.release,
+                pkg.arch, pkg.ui_from_repo]
+            pkg_id = ",".join(values)
+            self._pkg_ids[pkg] = pkg_id
+            return pkg_id
+
+    def find(self, name, epoch, version, release, arch, repo_id,
+             installed=None):
+        """Find a package by its name, epoch, version, release, arch & repo.
+
+        If more packages match the nevra, the one from repo_id is preferred.
+
+        :param installed: True = find installed package, False = find
+                          available package, None = depend on repo_id
+        :return: package object or None if not found
+        """
+        if self._nevra_index is None:
+            self._nevra_index = self._build_nevra_index()
+        if installed is None:
+            installed = repo_id.startswith('@')
+        key = (name, epoch, version, release, arch, installed)
+        pkgs = self._nevra_index.get(key)
+        if not pkgs:
+            return None
+        for pkg in pkgs:
+            if pkg.reponame == repo_id:
+                return pkg
+        return pkgs[0]
+
+    def _build_nevra_index(self):
+        """Build a (n, e, v, r, a, installed) -> packages index of the sack"""
+        index = {}
+        for pkg in self._sack.query().run():
+            installed = pkg.reponame == hawkey.SYSTEM_REPO_NAME
+            key = (pkg.name, str(pkg.epoch), pkg.version, pkg.release,
+                   pkg.arch, installed)
+            index.setdefault(key, []).append(pkg)
+        return index
+
+    @property
+    def search_index(self):
+        """Get the search index for the enabled repos in the sack.
+
+        The index is kept across reset(), as it only covers the repos.
+        """
+        if self._search_index is None:
+            cachedir = os.path.join(self._base.conf.cachedir,
+                                    'dnfdaemon-search')
+            # the missing indexes are only build, if the base allows it
+            build = getattr(self._base, 'build_search_index', True)
+            self._search_index = searchindex.SackIndex(self._base, cachedir,
+                                                       build)
+        return self._search_index
 
     def filter_packages(self, pkg_list, replace=True):
         """Filter a list of package objects and replace
@@ -300,27 +807,31 @@ class Packages:
 
     @property
     def updates(self):
-        """Get available updates."""
-        pkgs = []
-        try:
-            # we have to do upgrade_all & resolve
-            # to make sure pkgs exclude by repo priority etc
-            # get handled.
-            self._base.upgrade_all()
-            self._base.resolve(allow_erasing=True)
-        except dnf.exceptions.DepsolveError as e:
-            logger.debug(str(e))
-            return pkgs
-        # return install/upgrade type pkgs from transaction
-        for tsi in self._base.transaction:
-            #print(tsi.op_type, tsi.installed, tsi.erased, tsi.obsoleted)
-            if tsi.op_type == dnf.transaction.UPGRADE:
-                pkgs.append(tsi.installed)
-            elif tsi.op_type == dnf.transaction.INSTALL:
-                po = tsi.installed
-                # action is INSTALL, then it should be a installonlypkg
-                pkgs.append(po)
-        return pkgs
+        """Get available updates, cached for the current sack.
+
+        The updates are found by resolving an upgrade of all packages
+        in a separate goal, so packages excluded by repo priority etc.
+        get handled, without touching the goal of the current transaction.
+        """
+        if self._updates is None:
+            self._updates = self._find_updates()
+        return self._updates
+
+    def _find_updates(self):
+        """Resolve an upgrade of all packages in a separate goal."""
+        goal = dnf.goal.Goal(self._sack)
+        goal.upgrade_all()
+        if not goal.run(allow_uninstall=True,
+                        force_best=self._base.conf.best):
+            logger.debug('\n'.join(goal.problems))
+            return []
+        # return the upgrades and the installs, replacing installed pkgs:
+        # obsoleting pkgs & new versions of installed installonlypkgs
+        # (the other installs are new dependencies)
+        return goal.list_upgrades() + [
+            po for po in goal.list_installs()
+            if goal.obsoleted_by_package(po) or
+            (po.name, po.arch) in self._inst_na]
 
     @property
     def updates_all(self):
@@ -373,6 +884,13 @@ class Packages:
         inst = self.query.installed()
         return self.query.filter(obsoletes=inst)
 
+    @property
+    def obsoletes_set(self):
+        """Get available obsoletes as a set, cached for the current sack."""
+        if self._obsoletes_set is None:
+            self._obsoletes_set = frozenset(self.obsoletes.run())
+        return self._obsoletes_set
+
     @property
     def recent(self, showdups=False):
         """Get recent packages."""
@@ -395,15 +913,36 @@ class MDProgress(dnf.callback.DownloadProgress):
     def __init__(self, parent):
         super(MDProgress, self).__init__()
         self._last = -1.0
+        self._done = set()  # repos with the 1.0 progress send
+        self._held = None  # progress held back, while checking metadata
         self.parent = parent
 
+    def hold(self):
+        """Hold back the progress, until it is known to be a download."""
+        self._held = []
+
+    def release(self, send):
+        """Send the held back progress, if send is True, else drop it."""
+        held, self._held = self._held or [], None
+        if send:
+            for name, frac in held:
+                self.parent.repoMetaDataProgress(name, frac)
+
+    def _send(self, name, frac):
+        if self._held is not None:
+            self._held.append((name, frac))
+        else:
+            self.parent.repoMetaDataProgress(name, frac)
+
     def start(self, total_files, total_size):
         self._last = -1.0
+        self._done = set()
 
     def end(self, payload, status, msg):
         name = str(payload)
-        if status == dnf.callback.STATUS_OK:
-            self.parent.repoMetaDataProgress(name, 1.0)
+        if status == dnf.callback.STATUS_OK and name not in self._done:
+            self._done.add(name)
+            self._send(name, 1.0)
 
     def progress(self, payload, done):
         name = str(payload)
@@ -412,15 +951,21 @@ class MDProgress(dnf.callback.DownloadProgress):
             frac = done / float(cur_total_bytes)
         else:
             frac = 0.0
-        if frac > self._last + 0.01:
+        if frac > self._last + 0.01 and name not in self._done:
             self._last = frac
-            self.parent.repoMetaDataProgress(name, frac)
+            if frac >= 1.0:  # don't send it again, when it ends
+                self._done.add(name)
+            self._send(name, frac)
 
 
 class Progress(dnf.callback.DownloadProgress):
     """Package Download callback handler"""
 
-    def __init__(self, parent):
+    def __init__(self, parent, interval=0.1, min_frac=0.01):
+        """
+        :param interval: min. secs between the DownloadProgress signals
+        :param min_frac: total fraction gain sending DownloadProgress sooner
+        """
         super(Progress, self).__init__()
         self.parent = parent
         self.max_err = 1
@@ -431,13 +976,24 @@ class Progress(dnf.callback.DownloadProgress):
         self._dnl_errors = {}
         self._err_count = 0
         self.dnl = {}
+        self.done_size = 0.0  # running total of self.dnl
         self.last_frac = 0
+        self.interval = interval
+        self.min_frac = min_frac
+        self._sent_frac = 0.0  # total fraction of the last signal
+        self._sent_time = 0.0
+        self.sig_queue = None  # SignatureQueue for the downloaded packages
 
     def start(self, total_files, total_size):
         self.total_files = total_files
         self.total_size = float(total_size)
         self.download_files = 0
         self.download_size = 0.0
+        self.dnl = {}
+        self.done_size = 0.0
+        self.last_frac = 0
+        self._sent_frac = 0.0
+        self._sent_time = 0.0
         self.max_err = int(total_files / 2) + 1
         logger.debug('setting max_err to : %d', self.max_err)
         self.parent.downloadStart(total_files, total_size)
@@ -449,6 +1005,9 @@ class Progress(dnf.callback.DownloadProgress):
                       dnf.callback.STATUS_ALREADY_EXISTS,
                       dnf.callback.STATUS_DRPM]:
             self.download_files += 1
+            # the rpm of a delta rpm is rebuilt after the downloads
+            if self.sig_queue and status != dnf.callback.STATUS_DRPM:
+                self.sig_queue.submit(payload.pkg)
         elif status == dnf.callback.STATUS_FAILED:
             pload = str(payload)
             if pload in self._dnl_errors:
@@ -472,10 +1031,19 @@ class Progress(dnf.callback.DownloadProgress):
         if not pload in self.dnl:
             self.dnl[pload] = 0.0
         else:
+            self.done_size += done - self.dnl[pload]
             self.dnl[pload] = done
         total_frac = self.get_total()
         if total_frac > self.last_frac:
             self.last_frac = total_frac
+            now = time()
+            # throttle the signals, but always send a finished payload
+            if (now - self._sent_time < self.interval and
+                    total_frac - self._sent_frac < self.min_frac and
+                    done < cur_total_bytes):
+                return
+            self._sent_time = now
+            self._sent_frac = total_frac
             if cur_total_bytes:
                 frac = done / cur_total_bytes
             else:
@@ -485,11 +1053,7 @@ class Progress(dnf.callback.DownloadProgress):
 
     def get_total(self):
         """Get the total downloaded percentage."""
-        tot = 0.0
-        for value in self.dnl.values():
-            tot += value
-        frac = tot / self.total_size
-        return frac
+        return self.done_size / self.total_size
 
     def update(self):
         """Output the current progress."""
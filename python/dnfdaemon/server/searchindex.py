@@ -0,0 +1,263 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+
+"""
+On-disk trigram search index for package metadata
+"""
+import array
+import bisect
+import errno
+import hashlib
+import hawkey
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+
+logger = logging.getLogger('dnfdaemon.base.searchindex')
+
+# package attributes covered by the index
+FIELDS = ('name', 'summary', 'description', 'url')
+# shorter search keys has no trigrams, they are searched without the index
+MIN_KEY_LEN = 3
+
+_MAGIC = b'DDSI'
+_VERSION = 2
+# magic, version, packages, fields, digest of the package list
+_HEADER = struct.Struct('=4sIII32s')
+_FIELD = struct.Struct('=IIII')  # keys, keys offset, starts offset, postings
+
+
+def _trigrams(text):
+    """Get the set of trigram hashes for a text (case insensitive)."""
+    if not text:
+        return set()
+    text = text.lower()
+    return set(zlib.crc32(text[i:i + 3].encode('utf-8'))
+               for i in range(len(text) - 2))
+
+
+def packages_digest(pkgs):
+    """Get the sha256 of the package list an index refers to.
+
+    The index refers to the packages by position, so the order of the
+    packages (changed by excludes, arch etc.) must be the same.
+    """
+    digest = hashlib.sha256()
+    for pkg in pkgs:
+        digest.update(str(pkg).encode('utf-8') + b'\n')
+    return digest.digest()
+
+
+def repo_checksum(repo):
+    """Get the sha256 of the repomd.xml for a repo, None if not available."""
+    # FIXME: dnf.repo.Metadata is not public API
+    repomd_fn = getattr(getattr(repo, 'metadata', None), 'repomd_fn', None)
+    if not repomd_fn:
+        return None
+    try:
+        with open(repomd_fn, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except (IOError, OSError):
+        return None
+
+
+class SearchIndex:
+    """Trigram index over the FIELDS of a list of packages.
+
+    The packages are referenced by their position in the list the index
+    was build from, so the index can only be used with the same list.
+    For each field the index contains a sorted array of trigram hashes,
+    an array with the start of each hash in the postings, and the
+    postings (package positions).
+    """
+
+    def __init__(self, buf):
+        self._buf = buf
+        (magic, version, self.npkgs, nfields,
+         self.digest) = _HEADER.unpack_from(buf, 0)
+        if magic != _MAGIC or version != _VERSION or nfields != len(FIELDS):
+            raise ValueError('not a search index')
+        view = memoryview(buf)
+        self._fields = {}
+        for i, field in enumerate(FIELDS):
+            nkeys, keys_off, starts_off, post_off = _FIELD.unpack_from(
+                buf, _HEADER.size + i * _FIELD.size)
+            keys = view[keys_off:keys_off + nkeys * 4].cast('I')
+            starts = view[starts_off:starts_off + (nkeys + 1) * 4].cast('I')
+            npost = starts[nkeys] if nkeys else 0
+            postings = view[post_off:post_off + npost * 4].cast('I')
+            self._fields[field] = (keys, starts, postings)
+
+    @classmethod
+    def build(cls, pkgs):
+        """Build an index for a list of packages."""
+        sections = []
+        for field in FIELDS:
+            table = {}
+            for pos, pkg in enumerate(pkgs):
+                for key in _trigrams(getattr(pkg, field)):
+                    table.setdefault(key, []).append(pos)
+            keys = array.array('I', sorted(table))
+            starts = array.array('I', [0])
+            postings = array.array('I')
+            for key in keys:
+                postings.extend(table[key])
+                starts.append(len(postings))
+            sections.append((keys, starts, postings))
+        offset = _HEADER.size + len(FIELDS) * _FIELD.size
+        data = bytearray(offset)
+        _HEADER.pack_into(data, 0, _MAGIC, _VERSION, len(pkgs), len(FIELDS),
+                          packages_digest(pkgs))
+        for i, (keys, starts, postings) in enumerate(sections):
+            offsets = []
+            for arr in (keys, starts, postings):
+                offsets.append(len(data))
+                data.extend(arr.tobytes())
+            _FIELD.pack_into(data, _HEADER.size + i * _FIELD.size,
+                             len(keys), *offsets)
+        return cls(bytes(data))
+
+    @classmethod
+    def load(cls, path):
+        """Load an index from a file, the file is memory-mapped."""
+        with open(path, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buf)
+
+    def save(self, path):
+        """Save the index to a file (atomically replace existing file)."""
+        dirname = os.path.dirname(path)
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._buf)
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            try:
+                os.unlink(tmp_path)
+            except OSError:  # keep the original error
+                pass
+            raise
+
+    def candidates(self, field, key):
+        """Get the positions of the packages, where field might contain key.
+
+        The result is a superset of the matching packages, the caller
+        must verify the candidates.
+        """
+        keys, starts, postings = self._fields[field]
+        result = None
+        for hashed in _trigrams(key):
+            i = bisect.bisect_left(keys, hashed)
+            if i == len(keys) or keys[i] != hashed:
+                return set()
+            found = postings[starts[i]:starts[i + 1]]
+            if result is None:
+                result = set(found)
+            else:
+                result.intersection_update(found)
+            if not result:
+                break
+        return result
+
+
+class SackIndex:
+    """The search indexes for the enabled repositories in a sack.
+
+    An index is loaded from cachedir if it was build from the current
+    repo metadata, else it is build and saved for the next daemon start.
+    Packages from repos without an index (@System, @commandline, repos
+    without metadata) are searched without an index.
+    """
+
+    def __init__(self, base, cachedir, build=True):
+        """
+        :param build: build the missing indexes, else the repos without
+                      a saved index are searched without an index
+        """
+        self._sack = base.sack
+        self._build = build
+        self._cachedir = cachedir
+        self._indexes = []  # list of (packages, index)
+        self._unindexed = [hawkey.SYSTEM_REPO_NAME, hawkey.CMDLINE_REPO_NAME]
+        for repo in base.repos.iter_enabled():
+            checksum = repo_checksum(repo)
+            if checksum:
+                pkgs = self._sack.query().filter(reponame=repo.id).run()
+                index = self._get_index(repo.id, checksum, pkgs)
+            else:
+                index = None
+            if index:
+                self._indexes.append((pkgs, index))
+            else:
+                self._unindexed.append(repo.id)
+
+    def _get_index(self, repo_id, checksum, pkgs):
+        """Load the index for a repo or build it, if not found or outdated.
+
+        :return: the index, None if it is not saved and can't be build
+        """
+        repo_dir = os.path.join(self._cachedir, repo_id)
+        path = os.path.join(repo_dir, checksum + '.idx')
+        try:
+            index = SearchIndex.load(path)
+            if (index.npkgs == len(pkgs) and
+                    index.digest == packages_digest(pkgs)):
+                return index
+        except (IOError, OSError, ValueError):
+            pass
+        if not self._build:
+            return None
+        logger.debug('building search index for %s', repo_id)
+        index = SearchIndex.build(pkgs)
+        try:
+            if not os.path.isdir(repo_dir):
+                os.makedirs(repo_dir)
+            # remove the outdated indexes, the *.tmp files can be in use
+            # by other processes saving an index
+            for fn in os.listdir(repo_dir):
+                old_path = os.path.join(repo_dir, fn)
+                if fn.endswith('.idx') and old_path != path:
+                    try:
+                        os.unlink(old_path)
+                    except OSError as e:
+                        if e.errno != errno.ENOENT:  # removed by others
+                            raise
+            index.save(path)
+        except (IOError, OSError) as e:
+            logger.debug('cannot save search index : %s', str(e))
+        return index
+
+    def query(self, field, key):
+        """Get a query for packages where field contains key.
+
+        :return: a hawkey query or None if the index can't be used.
+        """
+        if (not self._indexes or field not in FIELDS or
+                len(key.lower()) < MIN_KEY_LEN):
+            return None
+        fdict = {'%s__substr' % field: key}
+        query = self._sack.query().filter(reponame=self._unindexed)
+        query = query.filter(hawkey.ICASE, **fdict)
+        found = []
+        for pkgs, index in self._indexes:
+            found.extend(pkgs[pos] for pos in index.candidates(field, key))
+        if found:
+            matches = self._sack.query().filter(pkg=found)
+            query = query.union(matches.filter(hawkey.ICASE, **fdict))
+        return query
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+"""
+Micro benchmark for the package id serialization in the dnfdaemon.
+
+It compares building the package id string on every call (the way
+_get_id used to do it) with the per sack id cache in backend.Packages,
+for the same number of _get_id calls per package as a GetPackages call
+with a few fake attributes makes.
+
+run it from the top of the checkout with:
+
+  PYTHONPATH=python/:. python3 test/bench-get-id.py
+"""
+
+import dnfdaemon.server.backend as backend
+import test.support as support
+import timeit
+
+ROUNDS = 2000
+CALLS_PER_PKG = 3
+
+
+def uncached_id(pkg):
+    values = [
+        pkg.name, str(pkg.epoch), pkg.version, pkg.release,
+        pkg.arch, pkg.ui_from_repo]
+    return ",".join(values)
+
+
+def main():
+    base = support.MockBase('main', 'updates')
+    packages = backend.Packages(base)
+    pkgs = packages.query.run()
+    calls = len(pkgs) * CALLS_PER_PKG * ROUNDS
+
+    def run_uncached():
+        for pkg in pkgs:
+            for _ in range(CALLS_PER_PKG):
+                uncached_id(pkg)
+
+    def run_cached():
+        for pkg in pkgs:
+            for _ in range(CALLS_PER_PKG):
+                packages.get_id(pkg)
+
+    for name, func in (('uncached', run_uncached), ('cached', run_cached)):
+        secs = min(timeit.repeat(func, number=ROUNDS, repeat=3))
+        print('%-10s : %8.3f usec per package id' %
+              (name, secs * 1e6 / calls))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark for the result formats of the package list methods.
+
+It compares the JSON string result (GetPackages) with the native D-Bus
+array of (pkg_id, {attr: value}) (GetPackagesNative) for a synthetic
+list of packages. For each format the CPU time and the peak memory
+(python allocations, traced by tracemalloc) is measured for building
+the result in the daemon, marshalling it into a D-Bus message and
+reading it back like a client.
+
+run it from the top of the checkout with:
+
+  PYTHONPATH=python/:. python3 test/bench-result-format.py
+"""
+
+import dbus
+import dbus.lowlevel
+import dnfdaemon.server
+import json
+import time
+import tracemalloc
+
+NUM_PKGS = 50000
+ATTRS = ['summary', 'size', 'action']
+
+
+class FakePackage:
+
+    def __init__(self, num):
+        self.pkg_id = 'package%d,0,1.0,1.fc22,x86_64,updates' % num
+        self.summary = 'summary of package number %d' % num
+        self.size = 1024 * num
+        self.action = 'update' if num % 10 else 'install'
+
+
+class BenchDaemon(dnfdaemon.server.DnfDaemonBase):
+    """Daemon, where the packages are FakePackages."""
+
+    def _get_id(self, po):
+        return po.pkg_id
+
+    def _get_attr(self, po, attr):
+        return getattr(po, attr, None)
+
+
+def new_message():
+    return dbus.lowlevel.SignalMessage('/', 'org.baseurl.Bench', 'Bench')
+
+
+def json_build(daemon, pkgs):
+    return json.dumps([daemon._get_po_list(po, ATTRS) for po in pkgs])
+
+
+def json_marshal(value):
+    msg = new_message()
+    msg.append(value, signature='s')
+    return msg
+
+
+def json_read(msg):
+    return json.loads(msg.get_args_list()[0])
+
+
+def native_build(daemon, pkgs):
+    return daemon._get_native_list(pkgs, ATTRS)
+
+
+def native_marshal(value):
+    msg = new_message()
+    msg.append(value, signature='a(sa{sv})')
+    return msg
+
+
+def native_read(msg):
+    return [[pkg_id] + [values.get(attr) for attr in ATTRS]
+            for pkg_id, values in msg.get_args_list()[0]]
+
+
+def measure(func, *args):
+    """Run func and get (result, cpu secs, peak MB)."""
+    tracemalloc.start()
+    start = time.process_time()
+    result = func(*args)
+    secs = time.process_time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, secs, peak / (1024.0 * 1024.0)
+
+
+def main():
+    daemon = BenchDaemon()
+    pkgs = [FakePackage(num) for num in range(NUM_PKGS)]
+    print('%d packages, attributes : %s' % (NUM_PKGS, ', '.join(ATTRS)))
+    print('%-8s %-8s %10s %10s' % ('format', 'step', 'cpu (s)', 'peak (MB)'))
+    for name, build, marshal, read in (
+            ('json', json_build, json_marshal, json_read),
+            ('native', native_build, native_marshal, native_read)):
+        value, secs, peak = measure(build, daemon, pkgs)
+        print('%-8s %-8s %10.3f %10.1f' % (name, 'build', secs, peak))
+        msg, secs, peak = measure(marshal, value)
+        print('%-8s %-8s %10.3f %10.1f' % (name, 'marshal', secs, peak))
+        del value
+        _, secs, peak = measure(read, msg)
+        print('%-8s %-8s %10.3f %10.1f' % (name, 'read', secs, peak))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""
+Load test for the read-only query pool of the system daemon.
+
+It runs 1, 2, 4 & 8 client processes, calling GetPackages (or Search)
+in a loop without holding the lock, and shows how the throughput (calls
+per second) scales with the number of concurrent clients.
+With --busy another client holds the lock and builds an update
+transaction in a loop, while the queries are running.
+
+start the system daemon (as root) with a query pool:
+
+  daemon/dnfdaemon-system.py --notimeout --query-workers 4
+
+and run the load test from the top of the checkout with:
+
+  PYTHONPATH=python/ python3 test/load-test-query-pool.py
+
+Start the daemon with --query-workers 1 to get the throughput of
+serialized queries to compare with.
+"""
+
+import argparse
+import multiprocessing
+import time
+
+CLIENTS = [1, 2, 4, 8]
+DURATION = 10  # seconds for each number of clients
+
+
+def get_client():
+    # the client module connects to the bus, when it is imported, so it
+    # must be imported in the client process
+    from dnfdaemon.client import Client
+    return Client()
+
+
+def run_query(cli, method):
+    if method == 'search':
+        cli.Search(['name', 'summary'], ['python'], ['size'], False, True,
+                   False)
+    else:
+        cli.GetPackages('available', ['summary', 'size'])
+
+
+def query_client(method, duration, ready, results):
+    cli = get_client()
+    ready.wait()
+    calls = 0
+    end = time.time() + duration
+    while time.time() < end:
+        run_query(cli, method)
+        calls += 1
+    results.put(calls)
+
+
+def busy_client(done):
+    cli = get_client()
+    cli.Lock()
+    try:
+        while not done.is_set():
+            cli.Update('*')
+            cli.ClearTransaction()
+    finally:
+        cli.Unlock()
+
+
+def run(context, method, num_clients, duration):
+    """Run num_clients query clients, return the calls per second."""
+    ready = context.Barrier(num_clients + 1)
+    results = context.Queue()
+    procs = [context.Process(target=query_client,
+                             args=(method, duration, ready, results))
+             for _ in range(num_clients)]
+    for proc in procs:
+        proc.start()
+    ready.wait()
+    calls = sum(results.get() for _ in procs)
+    for proc in procs:
+        proc.join()
+    return calls / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query pool load test')
+    parser.add_argument('--method', choices=['packages', 'search'],
+                        default='packages')
+    parser.add_argument('--duration', type=int, default=DURATION)
+    parser.add_argument('--busy', action='store_true',
+                        help='build transactions in a lock holding client')
+    args = parser.parse_args()
+    context = multiprocessing.get_context('spawn')
+    done = context.Event()
+    if args.busy:
+        busy = context.Process(target=busy_client, args=(done,))
+        busy.start()
+    # the first call starts the query pool, don't measure it
+    run_query(get_client(), args.method)
+    print('%-8s %12s %12s' % ('clients', 'calls/s', 'per client'))
+    for num_clients in CLIENTS:
+        rate = run(context, args.method, num_clients, args.duration)
+        print('%-8d %12.1f %12.1f' % (num_clients, rate, rate / num_clients))
+    if args.busy:
+        done.set()
+        busy.join()
+
+
+if __name__ == '__main__':
+    main()
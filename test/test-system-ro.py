@@ -2,6 +2,7 @@
 
 from apitest import TestBase
 from dnfdaemon.client import LockedError
+import ast
 import time
 
 """
@@ -146,6 +147,77 @@ class TestAPIDevel(TestBase):
             (n, e, v, r, a, repo_id) = self.to_pkg_tuple(pkg_id)
             self.assertEqual(n, "foo")
 
+    def test_ResultFormatNative(self):
+        '''
+        System: GetPackages, GetPackagesByName & Search (native)
+        '''
+        print()
+        attrs = ['summary', 'size', 'action']
+        try:
+            pkgs = self.GetPackages('installed', attrs)
+            by_name = self.GetPackagesByName('foo', attrs, False)
+            found = self.Search(['name'], ['foo'], attrs, True, True, False)
+            self.result_format = 'native'
+            self.assertEqual(self.GetPackages('installed', attrs), pkgs)
+            self.assertEqual(self.GetPackagesByName('foo', attrs, False),
+                             by_name)
+            self.assertEqual(self.Search(['name'], ['foo'], attrs,
+                                         True, True, False), found)
+        finally:
+            self.result_format = 'json'
+
+    def test_GetPackagesChunked(self):
+        '''
+        System: GetPackagesChunked and SearchChunked
+        '''
+        print()
+        pkgs = self.GetPackages('installed')
+        found = list(self.GetPackagesChunked('installed'))
+        print('  packages found : %s ' % len(found))
+        self.assertEqual(sorted(found), sorted(pkgs))
+        pkgs = self.Search(['name'], ['foo'], [], True, True, False)
+        found = list(self.SearchChunked(['name'], ['foo'], [],
+                                        True, True, False))
+        self.assertEqual(sorted(found), sorted(pkgs))
+
+    def test_GetPackagesPaged(self):
+        '''
+        System: GetPackagesPaged and GetPackagesPage
+        '''
+        print()
+        pkgs = self.GetPackages('available', ['size'])
+        page = self.GetPackagesPaged('available', ['size'], 'name', 0, 10)
+        self.assertIsInstance(page, dict)
+        self.assertEqual(page['total'], len(pkgs))
+        self.assertEqual(len(page['packages']), min(len(pkgs), 10))
+        found = list(page['packages'])
+        while len(found) < page['total']:
+            page = self.GetPackagesPage(page['cursor'], len(found), 10)
+            self.assertGreater(len(page['packages']), 0)
+            found.extend(page['packages'])
+        print('  packages found : %s ' % len(found))
+        self.assertEqual(sorted(found), sorted(pkgs))
+        self.assertIsNone(self.GetPackagesPage('not-a-cursor', 0, 10))
+
+    def test_GetAttributes(self):
+        '''
+        System: GetAttributes
+        '''
+        print()
+        pkgs = self.GetPackagesByName('foo', newest_only=False)
+        self.assertNotEqual(len(pkgs), 0)  # foo should always be there
+        pkg_ids = pkgs + ['not-found,0,1.0,1,noarch,main']
+        attrs = self.GetAttributes(pkg_ids, ['summary', 'size', 'action'])
+        self.assertIsInstance(attrs, dict)
+        self.assertIsNone(attrs['not-found,0,1.0,1,noarch,main'])
+        for pkg_id in pkgs:
+            values = attrs[pkg_id]
+            print("  Package : %s : %s" % (pkg_id, values))
+            self.assertEqual(values['summary'],
+                             self.GetAttribute(pkg_id, 'summary'))
+            self.assertIsInstance(values['size'], int)
+            self.assertIsInstance(values['action'], str)
+
     def test_Repositories(self):
         '''
         System: GetRepository and GetRepo
@@ -315,6 +387,27 @@ class TestAPIDevel(TestBase):
         print("not_found : %s" % not_found)
         self.assertIsNone(not_found)
 
+    def test_RefreshCache(self):
+        '''
+        System: RefreshCache
+        '''
+        print()
+        self.reset_signals()
+        status = self.RefreshCache()
+        self.assertIsInstance(status, dict)
+        for repo_id in status:
+            print("  %s : %s" % (repo_id, status[repo_id]))
+            self.assertIn(status[repo_id], ['updated', 'unchanged', 'failed'])
+        # the progress is only send for the downloaded metadata
+        for ts, parms in self._signals.get('RepoMetaDataProgress', []):
+            name, frac = ast.literal_eval(parms)
+            self.assertEqual(status.get(name), 'updated')
+        # nothing is downloaded again, for the refreshed metadata
+        self.reset_signals()
+        status = self.RefreshCache()
+        self.assertNotIn('updated', status.values())
+        self.assertFalse(self.check_signal('RepoMetaDataProgress'))
+
 #
 # System Only Tests
 #
@@ -2,12 +2,22 @@
 
 import dnfdaemon.server
 import dnfdaemon.server.backend as backend
+import dnfdaemon.server.searchindex as searchindex
 
 import datetime
+import dbus
+import dnf
 import dnf.callback
+import dnf.exceptions
+import dnf.sack
 import test.support as support
 import hawkey
 import json
+import multiprocessing.dummy
+import os
+import shutil
+import tempfile
+import threading
 import time
 from unittest import mock
 
@@ -22,9 +32,11 @@ class DnfBaseMock(backend.DnfBase):
         self.md_progress = backend.MDProgress(parent)
         self.progress = backend.Progress(parent)
         self._packages = None
+        self._default_repos = set(r.id for r in self.repos.iter_enabled())
 
     def setup_base(self):
         self._packages = backend.Packages(self._base)
+        self._loaded_repos = set(r.id for r in self.repos.iter_enabled())
 
     def __getattr__(self, attr):
         if hasattr(self._base, attr):
@@ -38,10 +50,23 @@ class DnfBaseMock(backend.DnfBase):
     def download_packages(self, to_dnl, progress):
         pass
 
+    def refresh_installed(self):
+        self._packages.refresh()
+
+    def repo_config_changed(self):
+        return False
+
     def close(self):
         pass
 
 
+def fake_add_repo_to_sack(base, repo):
+    """Fake repo loading, run in the repo loading processes."""
+    base.md_progress.parent.repoMetaDataProgress(repo.id, 1.0)
+    if repo.id == 'updates':
+        raise dnf.exceptions.RepoError('cannot download repomd.xml')
+
+
 class TestProgress(support.TestCase):
 
     result = """DownloadStart(1, 10240)
@@ -80,10 +105,25 @@ DownloadEnd('foobar0-1.0-1.noarch', None, 'done')"""
             self._simulate_download(progress, fnum)
         self.assertEqual('\n'.join(daemon.get_calls()), TestProgress.result)
 
+    def test_md_progress(self):
+        """Test the metadata progress is only send once for a repo."""
+        parent = mock.Mock()
+        progress = backend.MDProgress(parent)
+        progress.start(1, 10 * 1024)
+        self._simulate_download(progress, 0)
+        fracs = [c[0][1] for c in parent.repoMetaDataProgress.call_args_list]
+        self.assertEqual(fracs, [i / 10 for i in range(11)])
+        # a repo without progress is only send at the end
+        parent.reset_mock()
+        progress.start(1, 0)
+        progress.end(self._get_pload(1), dnf.callback.STATUS_OK, "done")
+        parent.repoMetaDataProgress.assert_called_once_with(
+            'foobar1-1.0-1.noarch', 1.0)
+
     def test_progress_multiple_files(self):
         """Test progress for downloading multiple files."""
         daemon = support.DaemonStub()
-        progress = backend.Progress(daemon)
+        progress = backend.Progress(daemon, interval=0)  # not throttled
         num_files = 10
         num_bytes = 1024 * 10 * num_files
         progress.start(num_files, num_bytes)
@@ -96,6 +136,30 @@ DownloadEnd('foobar0-1.0-1.noarch', None, 'done')"""
                          "DownloadEnd('foobar%d-1.0-1.noarch', None, 'done')"
                          % (num_files - 1))
 
+    def test_progress_throttled(self):
+        """Test the progress signals are throttled."""
+        daemon = support.DaemonStub()
+        progress = backend.Progress(daemon, interval=0.1, min_frac=0.045)
+        num_files = 10
+        progress.start(num_files, 1024 * 10 * num_files)
+        with mock.patch.object(backend, 'time', return_value=1.0) as clock:
+            self._simulate_download(progress, 0)
+            # the first gain, +5% and the finished payload
+            self.assertEqual(
+                [float(call.split(', ')[2]) for call in daemon.get_calls()
+                 if call.startswith('DownloadProgress')],
+                [0.01, 0.06, 0.1])
+            # the interval has passed
+            clock.return_value = 1.2
+            pload = self._get_pload(1)
+            progress.progress(pload, 0)
+            progress.progress(pload, 1024)
+        calls = daemon.get_calls()
+        self.assertEqual(len(calls), 1 + 3 + 1 + 1)
+        self.assertEqual(calls[-1], "DownloadProgress('foobar1-1.0-1.noarch',"
+                                    " 0.1, 0.11, 1)")
+        self.assertEqual(progress.done_size, 11 * 1024)
+
     def test_progress_mirrors(self):
         """Test progress for skipping mirrors."""
         daemon = support.DaemonStub()
@@ -167,9 +231,94 @@ class TestPackages(support.TestCase):
                                  'petzoo-1.0-1.noarch'])
         upds = list(map(str, pkgs.updates))
         self.assertEqual(upds, ['bar-2.0-1.noarch'])
+        # the updates are cached and the base goal is not touched
+        self.assertIs(pkgs.updates, pkgs.updates)
+        self.assertEqual(base._goal.req_length(), 0)
         obs = list(map(str, pkgs.obsoletes))
         self.assertEqual(obs, ['bar-new-2.0-1.noarch'])
 
+    def test_updates_obsoletes(self):
+        """Test the updates contains the obsoleting packages"""
+        base = support.MockBase('main')
+        pkgs = backend.Packages(base)
+        query = base.sack.query().available()
+        bar, = query.filter(name='bar', version='2.0').run()
+        bar_new, = query.filter(name='bar-new').run()
+        foo, = query.filter(name='foo', version='1.0').run()
+        petzoo, = query.filter(name='petzoo').run()
+        with mock.patch('dnf.goal.Goal') as goal_cls:
+            goal = goal_cls.return_value
+            goal.run.return_value = True
+            goal.list_upgrades.return_value = [bar]
+            # obsoleting, installonly & new dependency
+            goal.list_installs.return_value = [bar_new, foo, petzoo]
+            goal.obsoleted_by_package.side_effect = \
+                lambda po: ['bar-old'] if po is bar_new else []
+            self.assertEqual(pkgs.updates, [bar, bar_new, foo])
+
+    def test_refresh(self):
+        """Test rebuilding the caches for a new sack"""
+        base = support.MockBase('main')
+        pkgs = backend.Packages(base)
+        inst_na = pkgs._inst_na
+        upds = pkgs.updates
+        pkgs.get_id(upds[0])
+        pkgs.refresh()
+        self.assertIsNot(pkgs._inst_na, inst_na)
+        self.assertEqual(pkgs._inst_na, inst_na)
+        self.assertEqual(pkgs._pkg_ids, {})
+        self.assertIsNone(pkgs._updates)
+        self.assertIsNone(pkgs._search_index)
+        self.assertEqual(list(map(str, pkgs.updates)), ['bar-2.0-1.noarch'])
+
+    def test_find(self):
+        """Test finding packages by nevra & repo"""
+        base = support.MockBase('main', 'updates')
+        pkgs = backend.Packages(base)
+        po = pkgs.find('bar', '0', '2.0', '1', 'noarch', 'updates')
+        self.assertEqual(str(po), 'bar-2.0-1.noarch')
+        self.assertEqual(po.reponame, 'updates')
+        po = pkgs.find('bar', '0', '2.0', '1', 'noarch', 'main')
+        self.assertEqual(po.reponame, 'main')
+        po = pkgs.find('bar', '0', '1.0', '1', 'noarch', '@System')
+        self.assertEqual(po.reponame, '@System')
+        po = pkgs.find('bar', '0', '1.0', '1', 'noarch', '@System',
+                       installed=False)
+        self.assertEqual(po.reponame, 'main')
+        # epoch must match too
+        po = pkgs.find('bar', '1', '2.0', '1', 'noarch', 'main')
+        self.assertIsNone(po)
+
+    def test_get_action(self):
+        """Test the package actions"""
+        base = support.MockBase('main')
+        pkgs = backend.Packages(base)
+
+        def action(name, version, repo_id):
+            po = pkgs.find(name, '0', version, '1', 'noarch', repo_id)
+            return pkgs.get_action(po)
+
+        self.assertEqual(action('bar', '1.0', '@System'), 'remove')
+        self.assertEqual(action('bar', '2.0', 'main'), 'update')
+        self.assertEqual(action('bar-new', '2.0', 'main'), 'obsolete')
+        self.assertEqual(action('foo', '1.0', 'main'), 'downgrade')
+        self.assertEqual(action('petzoo', '1.0', 'main'), 'install')
+        self.assertIsNotNone(pkgs._action_table)
+        pkgs.reset_actions()
+        self.assertIsNone(pkgs._action_table)
+        self.assertEqual(pkgs._actions, {})
+
+    def test_get_id(self):
+        """Test the cached package ids"""
+        base = support.MockBase('main')
+        pkgs = backend.Packages(base)
+        po = pkgs.find('bar', '0', '2.0', '1', 'noarch', 'main')
+        self.assertEqual(pkgs.get_id(po), 'bar,0,2.0,1,noarch,main')
+        self.assertIn(po, pkgs._pkg_ids)
+        self.assertEqual(pkgs.get_id(po), 'bar,0,2.0,1,noarch,main')
+        pkgs.reset()
+        self.assertEqual(pkgs._pkg_ids, {})
+
 
 class TestAdvisory(support.TestCase):
 
@@ -227,6 +376,163 @@ class TestDnfBase(support.TestCase):
         """Test packages attr"""
         self.assertIsInstance(self.base.packages, backend.Packages)
 
+    def test_refresh_repos(self):
+        """Test the sack is only loaded again for changed metadata"""
+        repo_ids = [repo.id for repo in self.base.repos.iter_enabled()]
+        parent = self.base.md_progress.parent = mock.Mock()
+        downloaded = []
+
+        def load():  # the repomd.xml is always downloaded
+            payload = support.Payload('repomd', 1024)
+            self.base.md_progress.start(1, 1024)
+            self.base.md_progress.progress(payload, 1024)
+            return bool(downloaded)
+        with mock.patch.object(support.MockRepo, '_md_expire_cache'), \
+                mock.patch.object(support.MockRepo, 'load',
+                                  side_effect=load), \
+                mock.patch.object(searchindex, 'repo_checksum') as checksum, \
+                mock.patch.object(self.base, 'reset') as reset, \
+                mock.patch.object(self.base, 'setup_base') as setup:
+            # the repomd.xml is unchanged
+            checksum.return_value = 'old'
+            status = self.base.refresh_repos()
+            self.assertEqual(status, dict((r, 'unchanged') for r in repo_ids))
+            reset.assert_not_called()
+            # no progress for the metadata check
+            parent.repoMetaDataProgress.assert_not_called()
+            # the metadata is downloaded
+            downloaded.append(True)
+            checksum.side_effect = ['old', 'new'] * len(repo_ids)
+            status = self.base.refresh_repos()
+            self.assertEqual(status, dict((r, 'updated') for r in repo_ids))
+            reset.assert_called_once_with(sack=True)
+            setup.assert_called_once_with()
+            self.assertEqual(parent.repoMetaDataProgress.call_count,
+                             len(repo_ids))
+            # the sack is loaded, if it was not loaded before
+            downloaded.clear()
+            checksum.side_effect = None
+            self.base._packages = None
+            self.base.refresh_repos()
+            self.assertEqual(setup.call_count, 2)
+
+    def test_signature_checker(self):
+        """Test the signature checks share the transaction set"""
+        self.base.repos['main'].gpgcheck = True
+        pkgs = [mock.Mock(_from_cmdline=False, repoid='main',
+                          localPkg=mock.Mock(return_value='/tmp/foo.rpm'))
+                for _ in range(3)]
+        checker = backend.SignatureChecker(self.base)
+        with mock.patch('dnf.rpm.transaction.initReadOnlyTransaction') \
+                as init_ts, \
+                mock.patch('dnf.rpm.miscutils.checkSig',
+                           return_value=0) as check_sig:
+            for po in pkgs:
+                self.assertEqual(checker.check(po), (0, ''))
+            self.assertEqual(init_ts.call_count, 1)
+            self.assertEqual(check_sig.call_count, 3)
+            checker.keys_changed()
+            check_sig.return_value = 4
+            self.assertEqual(checker.check(pkgs[0]),
+                             (2, 'Package foo.rpm is not signed'))
+            self.assertEqual(init_ts.call_count, 2)
+
+    def test_signature_checker_workers(self):
+        """Test checking the signatures in parallel processes"""
+        self.base.repos['main'].gpgcheck = True
+        pkgs = [mock.Mock(_from_cmdline=False, repoid='main',
+                          localPkg=mock.Mock(return_value='/tmp/foo%d.rpm'
+                                             % num))
+                for num in range(3)]
+        pkgs.append(mock.Mock(_from_cmdline=True))
+        self.base.conf.localpkg_gpgcheck = False
+        checker = backend.SignatureChecker(self.base, workers=2)
+        # run the pool in threads, so the processes use the mocks
+        with mock.patch('dnf.rpm.transaction.initReadOnlyTransaction'), \
+                mock.patch('dnf.rpm.miscutils.checkSig',
+                           side_effect=lambda ts, path:
+                           4 if path == '/tmp/foo1.rpm' else 0), \
+                mock.patch.object(backend.multiprocessing, 'get_context',
+                                  return_value=multiprocessing.dummy) \
+                as context:
+            results = checker.check_all(pkgs)
+        context.assert_called_once_with('forkserver')
+        self.assertEqual(results, [(0, ''),
+                                   (2, 'Package foo1.rpm is not signed'),
+                                   (0, ''), (0, '')])
+
+    def test_signature_queue(self):
+        """Test checking the signatures, while downloading"""
+        self.base.repos['main'].gpgcheck = True
+        pkgs = [mock.Mock(_from_cmdline=False, repoid='main',
+                          localPkg=mock.Mock(return_value='/tmp/foo%d.rpm'
+                                             % num))
+                for num in range(3)]
+        failed = mock.Mock()
+        checker = backend.SignatureChecker(self.base)
+        progress = backend.Progress(mock.Mock())
+        progress.start(3, 3000)
+        with mock.patch('dnf.rpm.transaction.initReadOnlyTransaction'), \
+                mock.patch('dnf.rpm.miscutils.checkSig',
+                           side_effect=lambda ts, path:
+                           4 if path == '/tmp/foo1.rpm' else 0) as check_sig:
+            progress.sig_queue = backend.SignatureQueue(checker, failed)
+            for po in pkgs[:2]:
+                progress.end(mock.Mock(pkg=po), dnf.callback.STATUS_OK, '')
+            results = progress.sig_queue.results(pkgs)
+        failed.assert_called_once_with(pkgs[1],
+                                       'Package foo1.rpm is not signed')
+        self.assertEqual(results, [(0, ''),
+                                   (2, 'Package foo1.rpm is not signed'),
+                                   (0, '')])
+        # the package not downloaded is checked by results
+        self.assertEqual(check_sig.call_count, 3)
+
+    def test_signature_queue_workers(self):
+        """Test the signature checking processes of the queue"""
+        self.base.repos['main'].gpgcheck = True
+        po = mock.Mock(_from_cmdline=False, repoid='main',
+                       localPkg=mock.Mock(return_value='/tmp/foo.rpm'))
+        checker = backend.SignatureChecker(self.base, workers=2)
+        # run the pool in threads, so the processes use the mocks
+        with mock.patch('dnf.rpm.transaction.initReadOnlyTransaction'), \
+                mock.patch('dnf.rpm.miscutils.checkSig',
+                           return_value=0) as check_sig, \
+                mock.patch.object(backend.multiprocessing, 'get_context',
+                                  return_value=multiprocessing.dummy) \
+                as context:
+            sig_queue = backend.SignatureQueue(checker)
+            sig_queue.submit(po)
+            self.assertEqual(sig_queue.results([po]), [(0, '')])
+        context.assert_called_once_with('forkserver')
+        check_sig.assert_called_once_with(mock.ANY, '/tmp/foo.rpm')
+
+    def test_load_repos(self):
+        """Test loading the repos in parallel processes"""
+        self.base._base = support.MockBase('main', 'updates')
+        self.base.load_workers = 2
+        self.base.config_options = {}
+        self.base.md_progress.parent = mock.Mock()
+
+        def load_base(parent):
+            base = DnfBaseMock(parent)
+            base._base = support.MockBase('main', 'updates')
+            return base
+        # run the pool in threads, so the processes use the mock base
+        with mock.patch.object(dnf.sack, '_build_sack'), \
+                mock.patch.object(DnfBaseMock, '_add_repo_to_sack',
+                                  fake_add_repo_to_sack), \
+                mock.patch.object(backend, 'DnfBase', load_base), \
+                mock.patch.object(backend.multiprocessing, 'get_context',
+                                  return_value=multiprocessing.dummy) \
+                as context:
+            self.base._load_repos()
+        context.assert_called_once_with('forkserver')
+        # the progress from the processes is send by the daemon
+        progress = self.base.md_progress.parent.repoMetaDataProgress
+        self.assertEqual(sorted(call[0] for call in progress.call_args_list),
+                         [('main', 1.0), ('updates', 1.0)])
+
     def test_search_nodups(self):
         """Test search (nodups)"""
         found = self.base.search(['name'], ['foo'], showdups=False)
@@ -239,9 +545,113 @@ class TestDnfBase(support.TestCase):
         found = self.base.search(['name'], ['foo'], showdups=True)
         res = list(map(str, found))
         self.assertEqual(res, ['foo-2.0-1.noarch',
+                               'foo-1.0-1.noarch',
                                'foo-2.0-1.noarch',
-                               'foo-dep-err-1.0-1.noarch',
-                               'foo-1.0-1.noarch'])
+                               'foo-dep-err-1.0-1.noarch'])
+
+    def test_search_fields(self):
+        """Test search in multiple fields"""
+        found = self.base.search(['name', 'summary'], ['bar-1.0'],
+                                 showdups=True)
+        res = list(map(str, found))
+        self.assertEqual(res, ['bar-1.0-1.noarch', 'bar-1.0-1.noarch'])
+
+    def test_search_match_all(self):
+        """Test search with multiple keys"""
+        found = self.base.search(['name'], ['foo', 'err'], match_all=True)
+        res = list(map(str, found))
+        self.assertEqual(res, ['foo-dep-err-1.0-1.noarch'])
+        found = self.base.search(['name'], ['petzoo', 'bar-new'],
+                                 match_all=False)
+        res = list(map(str, found))
+        self.assertEqual(res, ['bar-new-2.0-1.noarch',
+                               'petzoo-1.0-1.noarch'])
+
+
+class TestSearchIndex(support.TestCase):
+
+    def setUp(self):
+        self.base = DnfBaseMock(None)
+        self.base.setup_base()
+        self.cachedir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cachedir)
+
+    def test_build(self):
+        """Test SearchIndex build, save & load"""
+        pkgs = self.base.sack.query().filter(reponame='main').run()
+        index = searchindex.SearchIndex.build(pkgs)
+        path = os.path.join(self.cachedir, 'main.idx')
+        index.save(path)
+        index = searchindex.SearchIndex.load(path)
+        self.assertEqual(index.npkgs, len(pkgs))
+        found = [pkgs[pos] for pos in index.candidates('name', 'FOO')]
+        res = sorted(map(str, found))
+        self.assertEqual(res, ['foo-1.0-1.noarch',
+                               'foo-2.0-1.noarch',
+                               'foo-dep-err-1.0-1.noarch'])
+        self.assertEqual(index.candidates('summary', 'zzzyyy'), set())
+
+    def test_search(self):
+        """Test search with the sack index"""
+        fields = ['name', 'summary']
+        expected = list(map(str, self.base.search(fields, ['bar'],
+                                                  showdups=True)))
+        with mock.patch('dnfdaemon.server.searchindex.repo_checksum',
+                        return_value='checksum'):
+            sack_index = searchindex.SackIndex(self.base, self.cachedir)
+            self.assertEqual(os.listdir(self.cachedir), ['main'])
+            self.base.packages._search_index = sack_index
+            self.assertIsNotNone(sack_index.query('name', 'bar'))
+            # too short for the index
+            self.assertIsNone(sack_index.query('name', 'ba'))
+            found = self.base.search(fields, ['bar'], showdups=True)
+            self.assertEqual(list(map(str, found)), expected)
+            # saved index is loaded on the next run
+            with mock.patch.object(searchindex.SearchIndex, 'build') as build:
+                searchindex.SackIndex(self.base, self.cachedir)
+                self.assertFalse(build.called)
+            # the index is build again, when the package order changed
+            pkgs = self.base.sack.query().filter(reponame='main').run()
+            with mock.patch.object(searchindex, 'packages_digest',
+                                   return_value=b'changed'), \
+                    mock.patch.object(searchindex.SearchIndex, 'build') \
+                    as build:
+                searchindex.SackIndex(self.base, self.cachedir)
+                build.assert_called_once_with(pkgs)
+
+    def test_outdated_indexes(self):
+        """Test only the outdated indexes are removed"""
+        repo_dir = os.path.join(self.cachedir, 'main')
+        os.makedirs(repo_dir)
+        for fn in ('old.idx', 'saving.tmp'):
+            open(os.path.join(repo_dir, fn), 'w').close()
+        with mock.patch('dnfdaemon.server.searchindex.repo_checksum',
+                        return_value='checksum'):
+            searchindex.SackIndex(self.base, self.cachedir)
+        self.assertEqual(sorted(os.listdir(repo_dir)),
+                         ['checksum.idx', 'saving.tmp'])
+
+    def test_save_failed(self):
+        """Test the error saving an index is not masked"""
+        pkgs = self.base.sack.query().filter(reponame='main').run()
+        index = searchindex.SearchIndex.build(pkgs)
+        path = os.path.join(self.cachedir, 'main.idx')
+        with mock.patch('os.rename', side_effect=OSError('rename')), \
+                mock.patch('os.unlink', side_effect=OSError('unlink')):
+            with self.assertRaisesRegex(OSError, 'rename'):
+                index.save(path)
+
+    def test_build_search_index(self):
+        """Test the search index is build, when the base is loaded"""
+        daemon = dnfdaemon.server.DnfDaemonBase()
+        daemon._base = self.base
+        with mock.patch('dnfdaemon.server.searchindex.repo_checksum',
+                        return_value='checksum'), \
+                mock.patch.object(self.base.conf, 'cachedir', self.cachedir):
+            daemon._build_search_index()
+        self.assertIsNotNone(self.base.packages._search_index)
 
 
 class TestCommonBase(support.TestCase):
@@ -259,6 +669,309 @@ class TestCommonBase(support.TestCase):
         self.daemon._base = self._get_base()
 
 
+class TestWarmup(TestCommonBase):
+
+    def setUp(self):
+        self._base = None
+        self.daemon = dnfdaemon.server.DnfDaemonBase()
+
+    def test_warmup(self):
+        base = self._get_base()
+
+        def get_base():
+            self.daemon._base = base
+            return base
+
+        with mock.patch.object(self.daemon, '_get_base',
+                               side_effect=get_base) as load, \
+                mock.patch('dnfdaemon.server.GLib'), \
+                mock.patch.object(self.daemon, 'BaseReady') as ready:
+            self.daemon.start_warmup()
+            # the request waits for the base loaded in the thread
+            self.assertIs(self.daemon.base, base)
+            self.assertIsNone(self.daemon._warmup)
+            self.daemon._warmup_done()
+            ready.assert_called_once_with(True)
+            # the base is only loaded once
+            self.daemon.start_warmup()
+            self.assertIsNone(self.daemon._warmup)
+            self.assertEqual(load.call_count, 1)
+
+    def test_warmup_failed(self):
+        base = mock.Mock()
+
+        def get_base():
+            self.daemon._base = base  # partly loaded
+            raise IOError('no metadata')
+
+        with mock.patch.object(self.daemon, '_get_base',
+                               side_effect=get_base), \
+                mock.patch('dnfdaemon.server.GLib'), \
+                mock.patch.object(self.daemon, 'BaseReady') as ready:
+            self.daemon.start_warmup()
+            self.daemon._warmup.exception()  # wait for the thread
+            self.daemon._warmup_done()
+            ready.assert_called_once_with(False)
+            self.assertIsNone(self.daemon._warmup)
+        # the partly loaded base is closed
+        base.close.assert_called_once_with()
+        self.assertIsNone(self.daemon._base)
+
+
+class TestWorker(TestCommonBase):
+
+    INSTALLED = ['bar,0,1.0,1,noarch,@System',
+                 'foo,0,2.0,1,noarch,@System',
+                 'bar-old,0,1.0,1,noarch,@System',
+                 'old-bar,0,1.0,1,noarch,@System']
+
+    def test_run_in_worker(self):
+        """Test the reply without a worker thread."""
+        reply = mock.Mock()
+        error = mock.Mock()
+        self.daemon.run_in_worker(reply, error, self.daemon.get_packages,
+                                  'installed', [])
+        self.assertEqual(json.loads(reply.call_args[0][0]), self.INSTALLED)
+        # None is replied without a value
+        self.daemon.run_in_worker(reply, error, self.daemon.clear_transaction)
+        reply.assert_called_with()
+        error.assert_not_called()
+        self.assertEqual(self.daemon._jobs, 0)
+
+    def test_run_in_worker_error(self):
+        reply = mock.Mock()
+        error = mock.Mock()
+        func = mock.Mock(side_effect=ValueError('bad value'))
+        self.daemon.run_in_worker(reply, error, func, 'arg')
+        func.assert_called_once_with('arg')
+        reply.assert_not_called()
+        self.assertIsInstance(error.call_args[0][0], ValueError)
+        self.assertEqual(self.daemon._jobs, 0)
+        self.assertFalse(self.daemon._is_working)
+
+    def test_run_in_worker_thread(self):
+        reply = mock.Mock()
+        error = mock.Mock()
+        self.daemon._setup_worker()
+        with mock.patch('dnfdaemon.server.GLib') as glib:
+            self.daemon.run_in_worker(reply, error, self.daemon.get_packages,
+                                      'installed', [])
+            self.assertEqual(self.daemon._jobs, 1)
+            self.daemon._worker.shutdown(wait=True)
+            # the reply is send, when the main loop calls _send_reply
+            reply.assert_not_called()
+            func, future, reply_handler, error_handler = \
+                glib.idle_add.call_args[0]
+            self.assertFalse(func(future, reply_handler, error_handler))
+        self.assertEqual(json.loads(reply.call_args[0][0]), self.INSTALLED)
+        error.assert_not_called()
+        self.assertEqual(self.daemon._jobs, 0)
+
+    def test_run_in_pool(self):
+        reply = mock.Mock()
+        error = mock.Mock()
+        self.daemon._setup_worker()
+        self.daemon._setup_query_pool(2)
+        busy = threading.Event()
+        self.daemon._worker.submit(busy.wait)  # a long running request
+        # run the pool in threads, so the processes use the mock base
+        with mock.patch('dnfdaemon.server.GLib') as glib, \
+                mock.patch('dnfdaemon.server.backend.DnfBase', DnfBaseMock), \
+                mock.patch('dnfdaemon.server.multiprocessing.get_context',
+                           return_value=multiprocessing.dummy) as context:
+            self.daemon.run_in_pool(reply, error, 'get_packages',
+                                    'installed', [])
+            # the pool is started without waiting for the worker
+            for _ in range(100):  # wait for the result from the pool
+                if glib.idle_add.called:
+                    break
+                time.sleep(0.1)
+            self.assertIsNotNone(self.daemon._pool)
+            context.assert_called_once_with('forkserver')
+            func, future, reply_handler, error_handler = \
+                glib.idle_add.call_args[0]
+            func(future, reply_handler, error_handler)
+        busy.set()
+        self.daemon._worker.shutdown(wait=True)
+        self.assertEqual(json.loads(reply.call_args[0][0]), self.INSTALLED)
+        error.assert_not_called()
+        self.assertEqual(self.daemon._jobs, 0)
+        # the pool sack is only loaded from the cache
+        pool_base = dnfdaemon.server._pool_daemon._base
+        self.assertFalse(pool_base.build_search_index)
+        self.assertTrue(all(repo.md_only_cached
+                            for repo in pool_base.repos.iter_enabled()))
+        # the pool is closed, when the base is reset
+        self.daemon._reset_base()
+        self.assertIsNone(self.daemon._pool)
+
+    def test_start_pool_closed(self):
+        """Test a pool started for a closed generation is not kept"""
+        self.daemon._setup_query_pool(1)
+        generation = self.daemon._pool_generation
+        self.daemon._close_pool()  # the base is changed meanwhile
+        with mock.patch('dnfdaemon.server.backend.DnfBase', DnfBaseMock), \
+                mock.patch('dnfdaemon.server.multiprocessing.get_context',
+                           return_value=multiprocessing.dummy):
+            pool, keep = self.daemon._start_pool(generation, {}, [])
+        self.assertFalse(keep)
+        self.assertIsNone(self.daemon._pool)
+        pool.terminate()
+
+    def test_main_loop_signal(self):
+        sent = []
+
+        def signal(*args):
+            sent.append(args)
+        signal._dbus_is_signal = True
+
+        wrapped = dnfdaemon.server.MainLoopSignal(signal)
+        # the D-Bus signal attributes are kept
+        self.assertTrue(wrapped._dbus_is_signal)
+        with mock.patch('dnfdaemon.server.GLib') as glib:
+            wrapped('main')
+            self.assertEqual(sent, [('main',)])
+            glib.idle_add.assert_not_called()
+            thread = threading.Thread(target=wrapped, args=('worker',))
+            thread.start()
+            thread.join()
+            self.assertEqual(sent, [('main',)])
+            emit = glib.idle_add.call_args[0][0]
+            self.assertFalse(emit())
+        self.assertEqual(sent, [('main',), ('worker',)])
+
+
+class TestProgressSignals(support.TestCase):
+
+    def setUp(self):
+        self.daemon = dnfdaemon.server.DnfDaemonBase()
+        self.daemon.RPMProgress = mock.Mock()
+        self.daemon.DownloadProgress = mock.Mock()
+        self.daemon.DownloadEnd = mock.Mock()
+
+    def test_not_coalesced(self):
+        """Test all progress signals are send without a progress rate"""
+        for done in range(3):
+            self.daemon.downloadProgress('foo', done / 4, done / 8, 0)
+        self.assertEqual(self.daemon.DownloadProgress.call_count, 3)
+
+    def test_coalesced(self):
+        """Test the progress signals are coalesced by package"""
+        self.daemon._setup_progress_rate(10)
+        progress = dnfdaemon.server.TransactionProgress(self.daemon)
+        rpm_progress = self.daemon.RPMProgress
+        with mock.patch('dnfdaemon.server.GLib') as glib:
+            # the start of the element is send at once
+            progress.progress('foo', dnf.callback.PKG_INSTALL, 0, 100, 1, 2)
+            self.assertEqual(rpm_progress.call_count, 1)
+            for done in range(10, 60, 10):
+                progress.progress('foo', dnf.callback.PKG_INSTALL, done, 100,
+                                  1, 2)
+                progress.progress('bar', dnf.callback.PKG_INSTALL, done, 100,
+                                  2, 2)
+            self.daemon.downloadProgress('foo', 0.5, 0.25, 0)
+            self.assertEqual(rpm_progress.call_count, 1)
+            glib.timeout_add.assert_called_once_with(
+                100, self.daemon._flush_progress)
+            # the end replaces the pending progress of the package
+            self.daemon.downloadEnd('foo', dnf.callback.STATUS_FAILED,
+                                    'error')
+            self.assertFalse(self.daemon._flush_progress())
+        self.assertEqual(rpm_progress.call_args_list,
+                         [mock.call('foo', 'install', 0, 100, 1, 2),
+                          mock.call('foo', 'install', 50, 100, 1, 2),
+                          mock.call('bar', 'install', 50, 100, 2, 2)])
+        self.daemon.DownloadProgress.assert_not_called()
+        self.daemon.DownloadEnd.assert_called_once_with(
+            'foo', dnf.callback.STATUS_FAILED, 'error')
+        self.assertIsNone(self.daemon._progress_timer)
+
+    def test_coalesced_order(self):
+        """Test the pending progress is send before a start or end"""
+        self.daemon._setup_progress_rate(10)
+        progress = dnfdaemon.server.TransactionProgress(self.daemon)
+        rpm_progress = self.daemon.RPMProgress
+        with mock.patch('dnfdaemon.server.GLib'):
+            progress.progress('foo', dnf.callback.PKG_INSTALL, 50, 100, 1, 2)
+            self.assertEqual(rpm_progress.call_count, 0)
+            progress.progress('bar', dnf.callback.PKG_INSTALL, 0, 100, 2, 2)
+            # the timer fires after the progress is send
+            self.assertFalse(self.daemon._flush_progress())
+        self.assertEqual(rpm_progress.call_args_list,
+                         [mock.call('foo', 'install', 50, 100, 1, 2),
+                          mock.call('bar', 'install', 0, 100, 2, 2)])
+
+
+class TestParkedBases(TestCommonBase):
+
+    def setUp(self):
+        TestCommonBase.setUp(self)
+        self.daemon._setup_base_cache(100)
+        self.daemon._base_key = self.daemon._get_base_key()
+
+    def test_park(self):
+        base = self.daemon._base
+        self.daemon._reset_base(park=True)
+        self.assertIsNone(self.daemon._base)
+        self.assertIn(self.daemon._get_base_key(), self.daemon._parked)
+        # the parked base is used for the same repos & config
+        self.assertIs(self.daemon._get_base(), base)
+        self.assertEqual(self.daemon._parked, {})
+
+    def test_switch_repos(self):
+        base = self.daemon._base
+        other = DnfBaseMock(self, repo='updates')
+        other.setup_base()
+        key = self.daemon._get_base_key(['updates'])
+        self.daemon._parked[key] = (other, 0)
+        self.daemon.set_enabled_repos(['updates'])
+        self.assertIs(self.daemon._base, other)
+        # switching back uses the parked base
+        self.daemon.set_enabled_repos([])
+        self.assertIs(self.daemon._base, base)
+        self.assertEqual(list(self.daemon._parked), [key])
+
+    def test_switch_new_repos(self):
+        base = self.daemon._base
+        key = self.daemon._base_key
+        with mock.patch('dnfdaemon.server.backend.DnfBase', DnfBaseMock):
+            self.daemon.set_enabled_repos(['updates'])
+        # the current base is parked, before a base is loaded for updates
+        self.assertIsNot(self.daemon._base, base)
+        self.assertEqual(list(self.daemon._parked), [key])
+        self.daemon.set_enabled_repos([])
+        self.assertIs(self.daemon._base, base)
+        self.assertEqual(list(self.daemon._parked),
+                         [self.daemon._get_base_key(['updates'])])
+
+    def test_reload_base_size(self):
+        size = 50 * 1024 * 1024
+        with mock.patch('dnfdaemon.server.backend.DnfBase', DnfBaseMock), \
+                mock.patch.object(support.MockRepo, '_md_expire_cache'), \
+                mock.patch('dnfdaemon.server._get_rss',
+                           side_effect=[100, 100, 100 + size]):
+            self.daemon._reload_base()
+        # measured after the sack is loaded
+        self.assertEqual(self.daemon._base_size, size)
+
+    def test_budget(self):
+        base = self.daemon._base
+        self.daemon._base_size = 200 * 1024 * 1024
+        with mock.patch.object(base, 'close') as close:
+            self.daemon._reset_base(park=True)
+        # the base is too large to be parked
+        close.assert_called_once_with()
+        self.assertEqual(self.daemon._parked, {})
+
+    def test_clear(self):
+        base = self.daemon._base
+        self.daemon._reset_base(park=True)
+        with mock.patch.object(base, 'close') as close:
+            self.daemon._reset_base()
+        close.assert_called_once_with()
+        self.assertEqual(self.daemon._parked, {})
+
+
 class TestBrokenDeps(TestCommonBase):
 
     def _get_base(self, reset=False, load_sack=True):
@@ -325,11 +1038,154 @@ class TestCommonMisc(TestCommonBase):
              'bar-old,0,1.0,1,noarch,@System',
              'old-bar,0,1.0,1,noarch,@System'])
 
+    def test_get_packages_native(self):
+        value = self.daemon.get_packages_native('installed', ['size', 'url'])
+        self.assertEqual(value.signature, '(sa{sv})')
+        # url is None, so it is an empty byte array
+        self.assertEqual(value,
+            [('bar,0,1.0,1,noarch,@System', {'size': 0, 'url': []}),
+             ('foo,0,2.0,1,noarch,@System', {'size': 0, 'url': []}),
+             ('bar-old,0,1.0,1,noarch,@System', {'size': 0, 'url': []}),
+             ('old-bar,0,1.0,1,noarch,@System', {'size': 0, 'url': []})])
+        self.assertEqual(value[0][1]['url'].signature, 'y')
+        value = self.daemon.search_native(['name'], ['petzoo'], ['action'],
+                                          True, True, False)
+        self.assertEqual(value,
+            [('petzoo,0,1.0,1,noarch,main', {'action': 'install'})])
+
+    def test_native_same_as_json(self):
+        """Test the Native result has the same values as the JSON result"""
+        def from_native(value):
+            if isinstance(value, dbus.Array) and value.signature == 'y':
+                return None
+            elif isinstance(value, list):
+                return [from_native(v) for v in value]
+            elif isinstance(value, dict):
+                return dict((k, from_native(v)) for k, v in value.items())
+            return value
+
+        attrs = ['size', 'url', 'action']
+        native = self.daemon.get_packages_native('installed', attrs)
+        self.assertEqual(
+            [[pkg_id] + [from_native(values[attr]) for attr in attrs]
+             for pkg_id, values in native],
+            json.loads(self.daemon.get_packages('installed', attrs)))
+        value = dnfdaemon.server._to_dbus({'a': [None, ''], 'b': None})
+        self.assertEqual(from_native(value), {'a': [None, ''], 'b': None})
+
+    def test_to_dbus(self):
+        value = dnfdaemon.server._to_dbus(
+            [1, 'a', True, None, {'b': 2.0, 'c': None}])
+        self.assertEqual(value.signature, 'v')
+        self.assertEqual(value, [1, 'a', True, [], {'b': 2.0, 'c': []}])
+        self.assertEqual(value[3].signature, 'y')
+        self.assertIsInstance(value[0], dbus.Int64)
+        self.assertIsInstance(value[2], dbus.Boolean)
+        self.assertEqual(value[4].signature, 'sv')
+
+    def test_get_packages_chunked(self):
+        with mock.patch('dnfdaemon.server.GLib') as glib, \
+                mock.patch.object(dnfdaemon.server, 'CHUNK_SIZE', 3), \
+                mock.patch.object(self.daemon, 'PackageChunk') as chunk:
+            handle = self.daemon.get_packages_chunked('installed', [])
+            func, arg = glib.idle_add.call_args[0]
+            self.assertEqual(arg, handle)
+            self.assertTrue(self.daemon._streams)
+            # called by the main loop, until it returns False
+            while func(arg):
+                pass
+        chunks = [json.loads(call[0][1]) for call in chunk.call_args_list]
+        self.assertEqual(chunks,
+            [['bar,0,1.0,1,noarch,@System',
+              'foo,0,2.0,1,noarch,@System',
+              'bar-old,0,1.0,1,noarch,@System'],
+             ['old-bar,0,1.0,1,noarch,@System'],
+             None])
+        self.assertEqual(self.daemon._streams, {})
+
+    def test_search_chunked_cancel(self):
+        with mock.patch('dnfdaemon.server.GLib') as glib, \
+                mock.patch.object(self.daemon, 'PackageChunk') as chunk:
+            handle = self.daemon.search_chunked(['name'], ['bar'], [],
+                                                True, True, False)
+            func, arg = glib.idle_add.call_args[0]
+            self.daemon._reset_base()
+            chunk.assert_called_once_with(handle, 'null')
+            self.assertFalse(func(arg))
+
+    def test_get_packages_paged(self):
+        value = self.daemon.get_packages_paged('installed', ['size'], 'name',
+                                               0, 2)
+        page = json.loads(value)
+        self.assertEqual(page['total'], 4)
+        self.assertEqual(page['packages'],
+            [['bar,0,1.0,1,noarch,@System', 0],
+             ['bar-old,0,1.0,1,noarch,@System', 0]])
+        cursor = page['cursor']
+        page = json.loads(self.daemon.get_packages_page(cursor, 2, 2))
+        self.assertEqual(page['packages'],
+            [['foo,0,2.0,1,noarch,@System', 0],
+             ['old-bar,0,1.0,1,noarch,@System', 0]])
+        page = json.loads(self.daemon.get_packages_page(cursor, 4, 2))
+        self.assertEqual(page, {'cursor': cursor, 'total': 4,
+                                'packages': []})
+        # the cursor is dropped, when the sack is changed
+        self.daemon._base.setup_base()
+        page = json.loads(self.daemon.get_packages_page(cursor, 0, 2))
+        self.assertIsNone(page)
+
+    def test_get_packages_paged_sort_key(self):
+        for sort_key in ('requires', 'no_such_attr'):
+            with self.assertRaisesRegex(ValueError, 'Cannot sort by'):
+                self.daemon.get_packages_paged('installed', [], sort_key,
+                                               0, 2)
+        self.assertEqual(self.daemon._cursors, {})
+
+    def test_get_packages_page_expired(self):
+        value = self.daemon.get_packages_paged('installed', [], '', 0, 1)
+        cursor = json.loads(value)['cursor']
+        with mock.patch.object(dnfdaemon.server, 'CURSOR_TIMEOUT', -1):
+            page = json.loads(self.daemon.get_packages_page(cursor, 0, 1))
+        self.assertIsNone(page)
+        self.assertEqual(self.daemon._cursors, {})
+
+    def test_get_packages_paged_cursors(self):
+        """Test the cursors are limited and dropped with the sender"""
+        with mock.patch.object(dnfdaemon.server, 'MAX_CURSORS', 2):
+            cursors = [json.loads(self.daemon.get_packages_paged(
+                'installed', [], '', 0, 1, ':1.42'))['cursor']
+                for _ in range(3)]
+            other = json.loads(self.daemon.get_packages_paged(
+                'installed', [], '', 0, 1, ':1.43'))['cursor']
+        # the least recently used cursor of the sender is dropped
+        self.assertEqual(set(self.daemon._cursors),
+                         set(cursors[1:] + [other]))
+        self.daemon._name_owner_changed(':1.42', '')
+        self.assertEqual(list(self.daemon._cursors), [other])
+        # expired by the watchdog
+        with mock.patch.object(dnfdaemon.server, 'CURSOR_TIMEOUT', -1):
+            self.daemon._watchdog()
+        self.assertEqual(self.daemon._cursors, {})
+
     def test_get_attribute(self):
         pkg_id = 'bar,0,2.0,1,noarch,main'
         attr = self.daemon.get_attribute(pkg_id, 'size')
         self.assertEqual(json.loads(attr), 0)
 
+    def test_get_attributes(self):
+        pkg_ids = ['bar,0,2.0,1,noarch,main', 'foo,0,2.0,1,noarch,@System',
+                   'not-found,0,1.0,1,noarch,main']
+        attrs = self.daemon.get_attributes(pkg_ids, ['size', 'action'])
+        self.assertEqual(json.loads(attrs),
+            {'bar,0,2.0,1,noarch,main': {'size': 0, 'action': 'update'},
+             'foo,0,2.0,1,noarch,@System': {'size': 0, 'action': 'remove'},
+             'not-found,0,1.0,1,noarch,main': None})
+
+    def test_get_attribute_not_found(self):
+        pkg_id = 'bar,1,2.0,1,noarch,main'  # wrong epoch
+        attr = self.daemon.get_attribute(pkg_id, 'size')
+        self.assertEqual(json.loads(attr), None)
+
     def test_get_attribute_fake(self):
         pkg_id = 'bar,0,2.0,1,noarch,main'
         attr = self.daemon.get_attribute(pkg_id, 'action')
@@ -399,6 +1255,131 @@ class TestCommonMisc(TestCommonBase):
             ["foo-dep-err,0,1.0,1,noarch,main",
              "bar-dep-err,0,1.0,1,noarch,main"])
 
+    def test_get_obsoletes(self):
+        """Test the obsoletes cache is refreshed after a repo change"""
+        obsoletes = self.daemon._get_obsoletes()
+        self.assertIsInstance(obsoletes, frozenset)
+        self.assertEqual(list(map(str, obsoletes)), ['bar-new-2.0-1.noarch'])
+        self.assertIs(self.daemon._get_obsoletes(), obsoletes)
+
+        def get_base(reset=False, load_sack=True):
+            self.daemon._base = DnfBaseMock(self, repo='updates')
+            return self.daemon._base
+
+        with mock.patch.object(self.daemon, '_get_base',
+                               side_effect=get_base):
+            self.daemon.set_enabled_repos(['updates'])
+        self.assertEqual(self.daemon._get_obsoletes(), frozenset())
+
+    def test_refresh_cache_repo_config(self):
+        """Test a new base is loaded, when the .repo files are changed"""
+        base = self.daemon._base
+        with mock.patch.object(base, 'repo_config_changed',
+                               return_value=True), \
+                mock.patch.object(base, 'refresh_repos') as refresh, \
+                mock.patch.object(base, 'close') as close, \
+                mock.patch.object(self.daemon, '_get_base') as get_base:
+            new = get_base.return_value
+            main = mock.Mock(id='main')
+            updates = mock.Mock(id='updates')
+            # updates is skipped, when the sack is loaded
+            new.repos.iter_enabled.side_effect = [[main, updates], [main]]
+            status = self.daemon._refresh_cache()
+        self.assertEqual(status, {'main': 'updated', 'updates': 'failed'})
+        close.assert_called_once_with()  # the old base is not reused
+        refresh.assert_not_called()
+        get_base.assert_called_once_with(load_sack=False)
+        new.expire_cache.assert_called_once_with()
+        new.setup_base.assert_called_once_with()
+        new.refresh_repos.assert_not_called()
+
+    def test_refresh_cache_cold(self):
+        """Test the metadata is checked, before the sack is loaded"""
+        self.daemon._base.close()
+        self.daemon._base = None
+        with mock.patch.object(self.daemon, '_get_base') as get_base:
+            new = get_base.return_value
+            new.refresh_repos.return_value = {'main': 'unchanged'}
+            status = self.daemon._refresh_cache()
+        self.assertEqual(status, {'main': 'unchanged'})
+        get_base.assert_called_once_with(load_sack=False)
+        new.refresh_repos.assert_called_once_with()
+        new.setup_base.assert_not_called()  # refresh_repos loads the sack
+
+    def test_set_enabled_repos(self):
+        """Test changing the enabled repos in the loaded sack"""
+        base = self.daemon._base
+        self.daemon.set_enabled_repos(['updates'])  # main is disabled
+        self.assertIs(self.daemon._base, base)
+        self.assertEqual(json.loads(self.daemon.get_packages('available', [])),
+                         [])
+        self.assertEqual(len(json.loads(
+            self.daemon.get_packages('installed', []))), 4)
+        self.daemon.set_enabled_repos(['main'])
+        self.assertIs(self.daemon._base, base)
+        self.assertIn('petzoo,0,1.0,1,noarch,main',
+                      json.loads(self.daemon.get_packages('available', [])))
+        # an empty list enables the repos enabled in the config
+        self.daemon.set_enabled_repos(['updates'])
+        self.daemon.set_enabled_repos([])
+        self.assertIs(self.daemon._base, base)
+        self.assertIn('petzoo,0,1.0,1,noarch,main',
+                      json.loads(self.daemon.get_packages('available', [])))
+
+    def test_progress_rate(self):
+        """Test the download progress is throttled by the progress rate"""
+        self.daemon._setup_progress_rate(4)
+        with mock.patch('dnfdaemon.server.backend.DnfBase', DnfBaseMock):
+            base = self.daemon._get_base(reset=True)
+        self.assertEqual(base.progress.interval, 0.25)
+        self.daemon._setup_progress_rate(0)  # send all
+        with mock.patch('dnfdaemon.server.backend.DnfBase', DnfBaseMock):
+            base = self.daemon._get_base(reset=True)
+        self.assertEqual(base.progress.interval, 0)
+
+    def test_authorization_cache(self):
+        """Test the authorizations expire"""
+        authorized = self.daemon.authorized_sender_read
+        self.assertFalse(self.daemon._is_authorized(authorized, ':1.42'))
+        self.daemon._set_authorized(authorized, ':1.42')
+        self.assertTrue(self.daemon._is_authorized(authorized, ':1.42'))
+        self.daemon._auth_ttl = -1
+        self.daemon._set_authorized(authorized, ':1.42')
+        self.assertFalse(self.daemon._is_authorized(authorized, ':1.42'))
+        self.assertEqual(authorized, {})
+
+    def test_name_owner_changed(self):
+        """Test the clients are forgotten, when they disconnect"""
+        self.daemon._set_authorized(self.daemon.authorized_sender_read,
+                                    ':1.42')
+        self.daemon._set_authorized(self.daemon.authorized_sender_write,
+                                    ':1.42')
+        self.daemon._lock = ':1.42'
+        self.daemon._name_owner_changed(':1.43', '')
+        self.daemon._name_owner_changed(':1.42', ':1.42')
+        self.assertEqual(self.daemon._lock, ':1.42')
+        self.assertIn(':1.42', self.daemon.authorized_sender_read)
+        self.daemon._name_owner_changed(':1.42', '')
+        self.assertIsNone(self.daemon._lock)
+        self.assertEqual(self.daemon.authorized_sender_read, {})
+        self.assertEqual(self.daemon.authorized_sender_write, {})
+
+    def test_watch_sender(self):
+        """Test only the clients with cached state are watched"""
+        bus = mock.Mock()
+        self.daemon._setup_name_watch(bus)
+        for authorized in (self.daemon.authorized_sender_read,
+                           self.daemon.authorized_sender_write):
+            self.daemon._set_authorized(authorized, ':1.42')
+        name, callback = bus.watch_name_owner.call_args[0]
+        self.assertEqual(name, ':1.42')
+        self.assertEqual(bus.watch_name_owner.call_count, 1)
+        # the client disconnects
+        callback('')
+        bus.watch_name_owner.return_value.remove.assert_called_once_with()
+        self.assertEqual(self.daemon._name_watches, {})
+        self.assertEqual(self.daemon.authorized_sender_read, {})
+
     def test_get_actions(self):
         """Test package actions"""
         attrs = ['action']
@@ -580,6 +1561,17 @@ class TestCommonTransaction(TestCommonBase):
         self.assertEqual(json.loads(res),
             [True, [['reinstall', [['foo,0,2.0,1,noarch,main', 0.0, []]]]]])
 
+    def test_signature_failed(self):
+        """Test the signature error uses the ids taken before the download"""
+        po = mock.Mock()
+        with mock.patch.object(self.daemon, 'TransactionEvent') as event, \
+                mock.patch.object(self.daemon, '_get_id') as get_id:
+            self.daemon._signature_failed({po: 'foo,0,2.0,1,noarch,main'},
+                                          po, 'not signed')
+        event.assert_called_once_with(
+            'signature-error', ['foo,0,2.0,1,noarch,main', 'not signed'])
+        get_id.assert_not_called()  # not using the base in the check thread
+
     def test_add_transaction_illegal(self):
         pkg_id = 'foo,0,2.0,1,noarch,main'
         res = self.daemon.add_transaction(pkg_id, 'illegal')
@@ -604,7 +1596,10 @@ class TestCommonTransaction(TestCommonBase):
         self.assertEqual(json.loads(trans),
             [True, [['install', [['petzoo,0,1.0,1,noarch,main', 0.0, []]]]]])
         # test _clear_transaction()
+        self.daemon._get_action(self.daemon._get_po(pkg_id))
         self.daemon.clear_transaction()
+        # the cached actions are dropped, when the goal is reset
+        self.assertEqual(self.daemon.base.packages._actions, {})
         trans = self.daemon.build_transaction()
         self.assertEqual(json.loads(trans), [False, []])
 
@@ -633,5 +1628,26 @@ class TestCommonTransaction(TestCommonBase):
         res = self.daemon.build_transaction()
         self.assertEqual(json.loads(res),
             [True, [['install', [['petzoo,0,1.0,1,noarch,main', 0.0, []]]]]])
+        base = self.daemon._base
         res = self.daemon.run_transaction()
         self.assertEqual(json.loads(res), [0, []])
+        # the base is kept after the transaction
+        self.assertIs(self.daemon._base, base)
+
+    def test_refresh_base(self):
+        base = self.daemon._base
+        packages = base._packages
+        # go through the real refresh, not the DnfBaseMock one
+        with mock.patch.object(DnfBaseMock, 'refresh_installed',
+                               backend.DnfBase.refresh_installed), \
+                mock.patch.object(dnf.Base, 'reset') as reset, \
+                mock.patch.object(dnf.Base, 'fill_sack') as fill_sack:
+            self.daemon._refresh_base()
+            reset.assert_called_once_with(sack=True, goal=True)
+            fill_sack.assert_called_once_with()
+            self.assertIs(self.daemon._base, base)
+            self.assertIs(base._packages, packages)
+            # the base is closed, when the sack can't be loaded again
+            fill_sack.side_effect = OSError('cannot open the rpmdb')
+            self.daemon._refresh_base()
+        self.assertIsNone(self.daemon._base)